@@ -0,0 +1,92 @@
+import sys
+import threading
+import time
+from array import array
+
+# Approximate footprint at 100,000 chatters with typical 4-25 character
+# names: ~3.7 MB for the name -> slot dict, ~0.8 MB for the name list,
+# ~5.3 MB for the interned strings and 0.4 MB for the timestamp array,
+# about 10 MB in total. memory_size() should stay under MEMORY_BOUND_BYTES
+# at that size.
+MEMORY_BOUND_BYTES = 12 * 1024 * 1024
+
+
+class ActivityRegistry:
+    """Compact last-seen registry for every chatter in the channel.
+
+    Names are interned and mapped to a slot number; last-seen times are
+    stored as whole seconds since the registry was created in an unsigned
+    32-bit array, so each chatter costs one dict entry, one list entry and
+    four bytes instead of a tz-aware datetime.
+    """
+
+    def __init__(self, retention_seconds=6 * 60 * 60):
+        self.retention_seconds = retention_seconds  # chatters older than this are pruned
+        self._epoch = time.monotonic()
+        self._last_prune = 0
+        self._slots = {}  # interned name -> index into _names/_last_seen
+        self._names = []
+        self._last_seen = array('I')
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return name in self._slots
+
+    def _now(self):
+        return int(time.monotonic() - self._epoch)
+
+    def touch(self, name):
+        """Record that a chatter was just seen"""
+        now = self._now()
+        with self._lock:
+            slot = self._slots.get(name)
+            if slot is not None:
+                self._last_seen[slot] = now
+                return
+            if self.retention_seconds and now - self._last_prune >= self.retention_seconds:
+                self._prune(now - self.retention_seconds)
+                self._last_prune = now
+            name = sys.intern(name)
+            self._slots[name] = len(self._names)
+            self._names.append(name)
+            self._last_seen.append(now)
+
+    def seconds_since_seen(self, name):
+        """Seconds since a chatter was last seen, or None if never seen"""
+        slot = self._slots.get(name)
+        if slot is None:
+            return None
+        return self._now() - self._last_seen[slot]
+
+    def count_active(self, seconds):
+        """Number of chatters seen within the last `seconds` seconds"""
+        threshold = self._now() - seconds
+        return sum(1 for seen in self._last_seen if seen >= threshold)
+
+    def prune(self, seconds):
+        """Forget chatters not seen for `seconds` seconds and compact storage"""
+        with self._lock:
+            return self._prune(self._now() - seconds)
+
+    def _prune(self, threshold):
+        names = []
+        last_seen = array('I')
+        for name, seen in zip(self._names, self._last_seen):
+            if seen >= threshold:
+                names.append(name)
+                last_seen.append(seen)
+        removed = len(self._names) - len(names)
+        self._names = names
+        self._last_seen = last_seen
+        self._slots = {name: i for i, name in enumerate(names)}
+        return removed
+
+    def memory_size(self):
+        """Approximate memory used by the registry in bytes"""
+        size = (sys.getsizeof(self._slots) + sys.getsizeof(self._names) +
+                sys.getsizeof(self._last_seen))
+        size += sum(sys.getsizeof(name) for name in self._names)
+        return size
@@ -0,0 +1,165 @@
+"""
+Single event loop runtime.
+
+Runs the Twitch IRC client, the Socket.IO server and TTS playback
+scheduling on one asyncio event loop served by aiohttp, instead of
+Flask-SocketIO's threading server plus a separate bot thread. Enabled with
+RUNTIME_MODE=asyncio.
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import socketio
+from aiohttp import web
+from rich import print
+
+from socket_emitter import SocketEmitter
+from tts_queue_manager import AsyncTTSQueueManager
+
+
+class AsyncSocketEmitter(SocketEmitter):
+    """SocketEmitter that sends through an AsyncServer on the event loop.
+
+    Emits made on the loop are scheduled directly; emits from other threads
+    (such as the OBS dispatcher) are handed over thread-safely.
+    """
+
+    def __init__(self, sio, loop, batch_interval=0):
+        super().__init__(sio, batch_interval)
+        self.loop = loop
+
+    def _on_loop(self):
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
+    def _send(self, event, data, room):
+        coro = self.socketio.emit(event, data, to=room)
+        if self._on_loop():
+            self.loop.create_task(coro)
+        else:
+            asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def _schedule_flush(self):
+        if self._on_loop():
+            self.loop.call_later(self.batch_interval, self.flush)
+        else:
+            self.loop.call_soon_threadsafe(self.loop.call_later, self.batch_interval, self.flush)
+
+
+def register_socket_handlers(sio, app_module):
+    """Route Socket.IO events to the handlers defined in main"""
+
+    @sio.event
+    async def connect(sid, environ, auth=None):
+        room, user_numbers = app_module.client_room(auth)
+        await sio.enter_room(sid, room)
+        # Only the connecting client gets the snapshot
+        await sio.emit(app_module.SLOT_SNAPSHOT, app_module.client_snapshot(auth, user_numbers), to=sid)
+
+    # The dashboard handlers are quick, so they run directly on the loop
+    for event, handler in (('tts', app_module.toggle_tts),
+                           ('pickrandom', app_module.pick_random),
+                           ('choose', app_module.choose_user),
+                           ('voice_change', app_module.change_voice)):
+        sio.on(event, lambda sid, value, handler=handler: handler(value))
+
+
+def flask_view(app_module):
+    """aiohttp handler that serves the Flask routes and static files"""
+    flask_app = app_module.app
+
+    async def handler(request):
+        body = await request.read()
+        with flask_app.test_request_context(request.path_qs, method=request.method,
+                                            headers=dict(request.headers), data=body):
+            response = flask_app.full_dispatch_request()
+            response.direct_passthrough = False  # let static files be read into the body
+            try:
+                body = response.get_data()
+            finally:
+                response.close()
+            headers = {key: value for key, value in response.headers.items()
+                       if key.lower() not in ('content-length', 'transfer-encoding')}
+            return web.Response(body=body, status=response.status_code, headers=headers)
+
+    return handler
+
+
+async def start_bot(app_module):
+    """Refresh credentials and connect the Twitch bot on this loop"""
+    loop = asyncio.get_running_loop()
+    app_module.startup.begin('twitch', timeout=app_module.STARTUP_TIMEOUT)
+    print("[bold blue]Refreshing Twitch credentials...[/bold blue]")
+    if not await loop.run_in_executor(None, app_module.refresh_twitch_token):
+        print("[bold red]Failed to refresh Twitch token. Cannot start bot.[/bold red]")
+        app_module.startup.finish('twitch', False, 'token refresh failed')
+        return
+
+    with open(app_module.BOT_FLAG_FILE, 'w') as f:
+        f.write('initialized')
+
+    print("[bold cyan]Initializing Twitch bot...[/bold cyan]")
+    app_module.twitchbot = app_module.TwitchBot()
+    app_module.restore_state(app_module.twitchbot)
+    try:
+        await app_module.twitchbot.start()
+    except Exception as e:
+        print(f"[bold red]Error running TwitchBot: {e}[/bold red]")
+        app_module.startup.finish('twitch', False, str(e))
+        app_module.twitchbot = None
+
+
+async def serve(app_module, host='0.0.0.0', port=8080):
+    loop = asyncio.get_running_loop()
+
+    # Blocking work (Polly, token refresh) runs on one fixed-size executor
+    workers = int(os.getenv('TTS_WORKERS', 3))
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tts-io'))
+
+    sio = socketio.AsyncServer(async_mode='aiohttp', cors_allowed_origins='*')
+    app_module.socket_emitter = AsyncSocketEmitter(
+        sio, loop, batch_interval=app_module.socket_emitter.batch_interval)
+    app_module.tts_queue = AsyncTTSQueueManager(
+        app_module.process_tts_async,
+        workers=workers,
+        max_depth=app_module.tts_queue.max_depth,
+        drop_policy=app_module.tts_queue.drop_policy,
+        coalesce_chars=app_module.tts_queue.coalesce_chars,
+        max_age=app_module.tts_queue.max_age
+    )
+    register_socket_handlers(sio, app_module)
+
+    web_app = web.Application()
+    sio.attach(web_app)
+    web_app.router.add_route('*', '/{tail:.*}', flask_view(app_module))
+
+    runner = web.AppRunner(web_app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    print(f"[bold green]Web server listening on http://{host}:{port} (asyncio runtime)[/bold green]")
+
+    # Audio, Polly and OBS come up on their own threads, the bot on this loop
+    app_module.start_subsystems(include_bot=False)
+    try:
+        await start_bot(app_module)
+        # Keep serving the web UI even if the bot stopped
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+def run(app_module, host='0.0.0.0', port=8080):
+    """Run the whole app on a single event loop until interrupted"""
+    try:
+        asyncio.run(serve(app_module, host, port))
+    except KeyboardInterrupt:
+        print("\n[bold red]Shutting down...[/bold red]")
+    finally:
+        if app_module.state_journal is not None:
+            app_module.state_journal.close()
+        if os.path.exists(app_module.BOT_FLAG_FILE):
+            os.remove(app_module.BOT_FLAG_FILE)
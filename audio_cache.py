@@ -0,0 +1,153 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from rich import print
+
+
+class AudioCache:
+    """Two-tier cache of synthesized audio keyed by SSML, voice, format and backend.
+
+    Recently used clips are kept in an in-memory LRU bounded by a byte
+    budget. Every clip is also written to a directory on disk so the cache
+    survives restarts; the disk store evicts least recently used files once
+    it grows past its own size limit.
+    """
+
+    def __init__(self, cache_dir=None, memory_bytes=32 * 1024 * 1024, disk_bytes=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._memory = OrderedDict()  # key -> audio bytes
+        self._memory_size = 0
+        self._disk = OrderedDict()  # key -> file size, least recently used first
+        self._disk_size = 0
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.memory_evictions = 0
+        self.disk_evictions = 0
+
+        if self.cache_dir:
+            self._load_disk_index()
+
+    @staticmethod
+    def make_key(text, voice_id, output_format, backend='polly'):
+        """Build the content address for a synthesis request"""
+        digest = hashlib.sha256()
+        digest.update(f"{backend}\0{voice_id}\0{output_format}\0{text}".encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return cached audio bytes for a key, or None on a miss"""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return data
+
+            if key in self._disk:
+                try:
+                    path = self._disk_path(key)
+                    with open(path, 'rb') as f:
+                        data = f.read()
+                    os.utime(path)  # keep eviction order across restarts
+                except OSError:
+                    self._forget_disk(key)
+                else:
+                    self._disk.move_to_end(key)
+                    self.disk_hits += 1
+                    self._remember(key, data)
+                    return data
+
+            self.misses += 1
+            return None
+
+    def put(self, key, data):
+        """Store audio bytes in both tiers"""
+        with self._lock:
+            self._remember(key, data)
+            if self.cache_dir and key not in self._disk:
+                self._store_on_disk(key, data)
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'memory_evictions': self.memory_evictions,
+                'disk_evictions': self.disk_evictions,
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_size,
+                'disk_entries': len(self._disk),
+                'disk_bytes': self._disk_size,
+            }
+
+    def _remember(self, key, data):
+        """Insert into the memory tier, evicting least recently used clips"""
+        if len(data) > self.memory_bytes:
+            return
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return
+        self._memory[key] = data
+        self._memory_size += len(data)
+        while self._memory_size > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+            self.memory_evictions += 1
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.audio")
+
+    def _load_disk_index(self):
+        """Rebuild the disk index from files left by previous runs"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            entries = []
+            for entry in os.scandir(self.cache_dir):
+                if entry.is_file() and entry.name.endswith('.audio'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name[:-len('.audio')], stat.st_size))
+        except OSError as e:
+            print(f"[yellow]Warning: Audio cache directory unavailable, using memory only: {e}[/yellow]")
+            self.cache_dir = None
+            return
+
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_size += size
+        self._evict_disk()
+
+    def _store_on_disk(self, key, data):
+        try:
+            # Write to a temp file first so a crash never leaves a truncated clip behind
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._disk_path(key))
+        except OSError as e:
+            print(f"[yellow]Warning: Could not write audio cache entry: {e}[/yellow]")
+            return
+        self._disk[key] = len(data)
+        self._disk_size += len(data)
+        self._evict_disk()
+
+    def _evict_disk(self):
+        while self._disk_size > self.disk_bytes and self._disk:
+            key = next(iter(self._disk))
+            self._forget_disk(key)
+            self.disk_evictions += 1
+            try:
+                os.remove(self._disk_path(key))
+            except OSError:
+                pass
+
+    def _forget_disk(self, key):
+        self._disk_size -= self._disk.pop(key)
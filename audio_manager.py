@@ -1,63 +1,363 @@
-import pygame
-import os
+import io
+import itertools
+import sys
+import threading
+import time
+import wave
+from array import array
+from collections import deque
+
+from rich import print
+
+import metrics
+
+pygame = None  # imported by AudioManager.start(), it takes a while and opens the audio device
+
+# Leading bytes of the containers that have to be decoded, anything else handed in with a pcm_rate is raw PCM
+CONTAINER_MAGIC = (b'RIFF', b'OggS', b'ID3', b'fLaC')
+
+
+def _import_pygame():
+    global pygame
+    if pygame is None:
+        import pygame as module
+        pygame = module
+    return pygame
+
 
 class AudioManager:
-    def __init__(self):
-        pygame.mixer.init()
-        self.audio_files = {}  # Dictionary to store audio files by their relative path
+    """Loads sounds by handle and plays them on one mixer channel per slot.
+
+    Clips queued for a slot play back to back on that slot's dedicated
+    channel. A single watcher thread notices when a channel finishes and
+    fires the clip's completion callback, so no thread sleeps for the
+    length of a clip. Optionally other slots are ducked while one speaks,
+    or slots take turns instead of talking over each other. Clips that
+    continue the current one (chunks of a long message) are queued on the
+    channel itself so the mixer switches to them without a gap.
+    """
+
+    def __init__(self, memory_budget=64 * 1024 * 1024, duck_volume=None, exclusive=False, poll_interval=0.02,
+                 frequency=None):
+        self.frequency = frequency  # mixer sample rate, None uses SDL's default
+        self.sounds = {}  # Dictionary to store loaded sounds by their handle
         self.current_sound = None
+        self._handles = itertools.count(1)
 
-    def load_audio(self, file_path):
-        """Load a single audio file and store it in the dictionary"""
-        sound = pygame.mixer.Sound(file_path)
-        self.audio_files[file_path] = sound
-        return sound
-    
-    def get_audio_length(self, file_path=None):
-        """Get the length of an audio file in seconds"""
-        if file_path:
-            if file_path in self.audio_files:
-                return self.audio_files[file_path].get_length()
+        self.memory_budget = memory_budget  # max bytes of decoded audio kept loaded
+        self.duck_volume = duck_volume  # volume for other slots while one is playing, None disables ducking
+        self.exclusive = exclusive  # only one slot plays at a time when True
+        self.poll_interval = poll_interval
+        self._sizes = {}  # handle -> decoded size in bytes
+        self._lengths = {}  # handle -> length in seconds
+        self.loaded_bytes = 0
+        self._channels = {}  # slot -> dedicated pygame.mixer.Channel
+        self._playing = {}  # slot -> (handle, on_complete)
+        self._pending = {}  # slot -> deque of (handle, on_start, on_complete, on_drop)
+        self._queued = {}  # slot -> (handle, on_start, on_complete) queued on the channel behind the current clip
+        self._deadlines = {}  # handle -> time.monotonic() after which the pending clip is dropped unplayed
+        self._lock = threading.RLock()
+        self._watcher = None
+        self._started = False
+
+    def start(self):
+        """Import pygame and open the mixer, safe to call more than once"""
+        with self._lock:
+            if not self._started:
+                if self.frequency:
+                    _import_pygame().mixer.init(frequency=self.frequency, size=-16)
+                else:
+                    _import_pygame().mixer.init()
+                self._started = True
+                frequency = pygame.mixer.get_init()[0]
+                if self.frequency and frequency != self.frequency:
+                    print(f"[yellow]Warning: Mixer opened at {frequency} Hz instead of {self.frequency} Hz, clips will be resampled[/yellow]")
+        return True
+
+    def load_audio(self, source, pcm_rate=None):
+        """Load audio from bytes (or a file path) and return a handle for it.
+
+        With pcm_rate, bytes without a container header are raw 16-bit mono
+        PCM at that rate, which is wrapped into a Sound without decoding and
+        whose length is known from its size.
+        """
+        if not self._started:
+            self.start()
+        start = time.perf_counter()
+        frequency, size, channels = pygame.mixer.get_init()
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            if pcm_rate and not bytes(source[:4]).startswith(CONTAINER_MAGIC):
+                sound = self._wrap_pcm(source, pcm_rate, frequency, size, channels)
+                length = (len(source) // 2) / pcm_rate
             else:
-                raise FileNotFoundError(f"Audio file '{file_path}' not loaded")
+                sound = pygame.mixer.Sound(file=io.BytesIO(source))
+                length = sound.get_length()
+        else:
+            sound = pygame.mixer.Sound(source)
+            length = sound.get_length()
+        decoded_size = int(length * frequency) * channels * abs(size) // 8
+        metrics.audio_load_seconds.observe(time.perf_counter() - start)
+        with self._lock:
+            handle = next(self._handles)
+            self.sounds[handle] = sound
+            self._sizes[handle] = decoded_size
+            self._lengths[handle] = length
+            self.loaded_bytes += decoded_size
+            callbacks = self._enforce_budget()
+        self._run_callbacks(callbacks)
+        return handle
+
+    def decode_audio(self, source, pcm_rate=None):
+        """Decode audio bytes to (interleaved 16-bit samples, sample rate, channels) without loading it.
+
+        Raw PCM (with pcm_rate) is returned as it is, anything else is
+        decoded by SDL into the mixer's format.
+        """
+        if pcm_rate and not bytes(source[:4]).startswith(CONTAINER_MAGIC):
+            return bytes(source), pcm_rate, 1
+        if not self._started:
+            self.start()
+        frequency, size, channels = pygame.mixer.get_init()
+        if size != -16:
+            raise ValueError(f"Can't decode to 16-bit samples with the mixer opened at {size} bits")
+        return pygame.mixer.Sound(file=io.BytesIO(source)).get_raw(), frequency, channels
+
+    def get_audio_length(self, handle=None):
+        """Get the length of a loaded sound in seconds"""
+        if handle:
+            if handle in self.sounds:
+                return self._lengths[handle]
+            else:
+                raise KeyError(f"Audio handle '{handle}' not loaded")
         elif self.current_sound:
             return self.current_sound.get_length()
         else:
             return 0
 
 
-    def load_multiple_audios(self, file_paths):
-        """Load multiple audio files at once"""
-        for file_path in file_paths:
-            self.load_audio(file_path)
+    def load_multiple_audios(self, sources):
+        """Load multiple audio clips at once and return their handles"""
+        return [self.load_audio(source) for source in sources]
 
-    def play_audio(self, file_path=None):
-        """Play audio by file path (ID) or play the current sound if no path specified"""
-        if file_path:
-            if file_path in self.audio_files:
-                self.current_sound = self.audio_files[file_path]
+    def play_audio(self, handle=None):
+        """Play audio by handle or play the current sound if no handle specified"""
+        if handle:
+            if handle in self.sounds:
+                self.current_sound = self.sounds[handle]
                 self.current_sound.play()
             else:
-                raise FileNotFoundError(f"Audio file '{file_path}' not loaded")
+                raise KeyError(f"Audio handle '{handle}' not loaded")
         elif self.current_sound:
             self.current_sound.play()
 
-    def is_playing(self):
+    def play_on_slot(self, handle, slot, on_start=None, on_complete=None, gapless=False, on_drop=None,
+                     expires_at=None):
+        """Queue a loaded clip on a slot's channel.
+
+        on_start() runs when the clip starts playing and on_complete() when
+        it has finished; the clip is unloaded automatically afterwards. A
+        clip that is dropped before it starts (stop_slot or the memory
+        budget) gets on_drop() instead of either, as does one still waiting
+        for its slot at expires_at (a time.monotonic() value). With
+        gapless=True the clip follows the slot's current clip directly on the
+        channel when possible.
+        """
+        if handle not in self.sounds:
+            raise KeyError(f"Audio handle '{handle}' not loaded")
+        with self._lock:
+            if gapless and slot in self._playing and slot not in self._queued and not self._pending.get(slot):
+                self._channels[slot].queue(self.sounds[handle])
+                self._queued[slot] = (handle, on_start, on_complete, on_drop)
+                callbacks = []
+            else:
+                if expires_at is not None:
+                    self._deadlines[handle] = expires_at
+                self._pending.setdefault(slot, deque()).append((handle, on_start, on_complete, on_drop))
+                callbacks = self._start_ready()
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch, name="audio-watcher", daemon=True)
+                self._watcher.start()
+        self._run_callbacks(callbacks)
+
+    def stop_slot(self, slot):
+        """Stop the slot's current clip and drop everything queued for it"""
+        callbacks = []
+        with self._lock:
+            for handle, _, _, on_drop in self._pending.pop(slot, ()):
+                self.unload_audio(handle)
+                callbacks.append(on_drop)
+            if slot in self._playing:
+                channel = self._channels[slot]
+                channel.stop()
+                queued = self._queued.pop(slot, None)
+                if queued is not None:
+                    # Stopping a channel starts its queued sound, so stop that as well
+                    channel.stop()
+                    self.unload_audio(queued[0])
+                    callbacks.append(queued[3])
+        self._run_callbacks(callbacks)
+
+    def close(self):
+        """Stop all playback and close the mixer, queued clips get no callbacks"""
+        with self._lock:
+            if not self._started:
+                return
+            self._playing.clear()
+            self._pending.clear()
+            self._queued.clear()
+            self._channels.clear()
+            pygame.mixer.quit()
+            self._started = False
+
+    def is_playing(self, slot=None):
+        if slot is not None:
+            with self._lock:
+                return slot in self._playing
         if self.current_sound:
             return pygame.mixer.get_busy()
         return False
-    
-    
-
-    def get_loaded_files(self):
-        """Return a list of all loaded audio file paths"""
-        return list(self.audio_files.keys())
-
-    def unload_audio(self, file_path, remove=True):
-        """Remove an audio file from memory"""
-        if file_path in self.audio_files:
-            del self.audio_files[file_path]
-            if self.current_sound == self.audio_files.get(file_path):
-                self.current_sound = None
-            if remove:
-                os.remove(file_path)
\ No newline at end of file
+
+
+
+    def get_loaded_handles(self):
+        """Return a list of all loaded audio handles"""
+        return list(self.sounds.keys())
+
+    def unload_audio(self, handle):
+        """Remove a sound from memory"""
+        with self._lock:
+            sound = self.sounds.pop(handle, None)
+            self.loaded_bytes -= self._sizes.pop(handle, 0)
+            self._lengths.pop(handle, None)
+            self._deadlines.pop(handle, None)
+        if sound is not None and self.current_sound is sound:
+            self.current_sound = None
+
+    @staticmethod
+    def _wrap_pcm(data, rate, frequency, size, channels):
+        """Sound for raw 16-bit mono PCM, without going through a decoder"""
+        if rate == frequency and size == -16 and channels == 1:
+            # Already in the mixer's sample layout, the bytes are used as they are
+            samples = array('h')
+            samples.frombytes(bytes(data[:len(data) - len(data) % 2]))
+            if sys.byteorder == 'big':
+                samples.byteswap()  # Polly sends little-endian samples
+            return pygame.mixer.Sound(buffer=samples)
+        # SDL's WAV loader upmixes and resamples in C, far faster than doing it here
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as clip:
+            clip.setnchannels(1)
+            clip.setsampwidth(2)
+            clip.setframerate(rate)
+            clip.writeframes(data)
+        buffer.seek(0)
+        return pygame.mixer.Sound(file=buffer)
+
+    def _channel_for(self, slot):
+        channel = self._channels.get(slot)
+        if channel is None:
+            index = len(self._channels)
+            if pygame.mixer.get_num_channels() <= index + 1:
+                pygame.mixer.set_num_channels(index + 2)
+            # Reserved channels are never picked by Sound.play()
+            pygame.mixer.set_reserved(index + 1)
+            channel = self._channels[slot] = pygame.mixer.Channel(index)
+        return channel
+
+    def _start_ready(self):
+        """Start the next clip on every idle slot that is allowed to play, returns their callbacks"""
+        callbacks = self._drop_expired()
+        ready = [slot for slot, queue in self._pending.items() if queue and slot not in self._playing]
+        if self.exclusive:
+            if self._playing or not ready:
+                return callbacks
+            # Slots take turns in the order their clips were loaded
+            ready = [min(ready, key=lambda slot: self._pending[slot][0][0])]
+        for slot in ready:
+            handle, on_start, on_complete, _ = self._pending[slot].popleft()
+            channel = self._channel_for(slot)
+            # The newest speaker plays at full volume and ducks everyone else
+            if self.duck_volume is not None:
+                for other in self._playing:
+                    self._channels[other].set_volume(self.duck_volume)
+            channel.set_volume(1.0)
+            channel.play(self.sounds[handle])
+            self._playing[slot] = (handle, on_complete)
+            callbacks.append(on_start)
+        return callbacks
+
+    def _drop_expired(self):
+        """Drop pending clips that waited past their deadline, returns their drop callbacks"""
+        callbacks = []
+        if not self._deadlines:
+            return callbacks
+        now = time.monotonic()
+        for slot, queue in self._pending.items():
+            while queue and self._deadlines.get(queue[0][0], now) < now:
+                handle, _, _, on_drop = queue.popleft()
+                print(f"[yellow]Skipping a queued clip for user {slot} that is too old to play[/yellow]")
+                self.unload_audio(handle)
+                callbacks.append(on_drop)
+        return callbacks
+
+    def _finish(self, slot):
+        """Release a slot whose clip ended, returns its completion callback"""
+        handle, on_complete = self._playing.pop(slot)
+        self.unload_audio(handle)
+        if self.duck_volume is not None and self._playing:
+            # Bring the most recent remaining speaker back to full volume
+            latest = next(reversed(list(self._playing)))
+            self._channels[latest].set_volume(1.0)
+        return on_complete
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                callbacks = self._advance_queued()
+                finished = [slot for slot in self._playing if not self._channels[slot].get_busy()]
+                callbacks += [self._finish(slot) for slot in finished]
+                if finished:
+                    callbacks += self._start_ready()
+            self._run_callbacks(callbacks)
+
+    def _advance_queued(self):
+        """Promote channel-queued clips the mixer has switched to, returns their callbacks"""
+        callbacks = []
+        for slot, queued in list(self._queued.items()):
+            channel = self._channels[slot]
+            if channel.get_queue() is not None and channel.get_busy():
+                continue
+            del self._queued[slot]
+            handle, on_start, on_complete, _ = queued
+            callbacks.append(self._finish(slot))
+            self._playing[slot] = (handle, on_complete)
+            callbacks.append(on_start)
+        return callbacks
+
+    def _enforce_budget(self):
+        """Drop the oldest queued clips until loaded audio fits the memory budget"""
+        callbacks = []
+        while self.loaded_bytes > self.memory_budget:
+            oldest = None
+            for slot, queue in self._pending.items():
+                if queue and (oldest is None or queue[0][0] < self._pending[oldest][0][0]):
+                    oldest = slot
+            if oldest is None:
+                break
+            handle, _, _, on_drop = self._pending[oldest].popleft()
+            print(f"[yellow]Audio memory budget exceeded, dropping a queued clip for user {oldest}[/yellow]")
+            self.unload_audio(handle)
+            # It never played, so there is no speaker to switch off
+            callbacks.append(on_drop)
+        return callbacks
+
+    def _run_callbacks(self, callbacks):
+        # Callbacks run outside the lock so they can safely queue more audio
+        for callback in callbacks:
+            if callback is None:
+                continue
+            try:
+                callback()
+            except Exception as e:
+                print(f"[red]Error in audio callback: {e}[/red]")
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Benchmark of loading TTS clips into AudioManager per audio format.
+
+Times AudioManager.load_audio for the same speech in each format Polly can
+return, with the mixer opened at the configured sample rate: raw pcm is
+wrapped into a Sound without decoding, while mp3 and ogg_vorbis go through
+SDL's decoders. Reports p50/p99 load latency, CPU time per load and the
+input and decoded sizes, and saves the results as JSON.
+
+pcm and a WAV reference clip are generated locally. There's no encoder
+for mp3 or ogg_vorbis here, so those clips come from Polly with --polly
+(uses the AWS_* settings) or from files named <format>.mp3 / <format>.ogg
+in --samples; formats without a clip are skipped.
+
+Usage: python benchmarks/bench_audio_formats.py [--rate 16000] [--seconds 3] [--loads 200]
+                                                 [--polly] [--samples DIR] [--output bench_audio_formats.json]
+"""
+
+import argparse
+import io
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import time
+import wave
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# No sound card needed, loading doesn't depend on the output device
+os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+from audio_manager import AudioManager
+from tts_backends import OUTPUT_FORMATS
+
+SAMPLE_TEXT = ("This is a benchmark of the text to speech pipeline, "
+               "reading a chat message about the length a viewer would type.")
+
+SAMPLE_FILES = {'mp3': 'mp3.mp3', 'ogg_vorbis': 'ogg_vorbis.ogg'}
+
+
+def make_pcm(seconds, rate):
+    """Signed 16-bit little-endian mono, a sweep so it isn't all silence"""
+    samples = array('h', (int(8000 * math.sin(2 * math.pi * (220 + i / rate * 200) * i / rate))
+                          for i in range(int(rate * seconds))))
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    return samples.tobytes()
+
+
+def make_wav(pcm, rate):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as clip:
+        clip.setnchannels(1)
+        clip.setsampwidth(2)
+        clip.setframerate(rate)
+        clip.writeframes(pcm)
+    return buffer.getvalue()
+
+
+def polly_clips(rate):
+    from dotenv import load_dotenv
+    from tts_backends import PollyBackend
+
+    load_dotenv()
+    backend = PollyBackend(aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+                           aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+                           region_name=os.getenv('AWS_REGION', 'us-east-1'),
+                           endpoint_url=os.getenv('POLLY_ENDPOINT_URL') or None)
+    clips = {}
+    for output_format, rates in OUTPUT_FORMATS.items():
+        if rate not in rates:
+            print(f"Polly has no {output_format} at {rate} Hz, skipped")
+            continue
+        clips[output_format] = backend.synthesize(SAMPLE_TEXT, 'Joanna', output_format, rate)
+    return clips
+
+
+def sample_clips(directory):
+    clips = {}
+    for output_format, name in SAMPLE_FILES.items():
+        path = os.path.join(directory, name)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                clips[output_format] = f.read()
+    return clips
+
+
+def bench(audio_manager, name, clip, pcm_rate, loads):
+    latencies = []
+    cpu_start = time.process_time()
+    for _ in range(loads):
+        start = time.perf_counter()
+        handle = audio_manager.load_audio(clip, pcm_rate=pcm_rate)
+        latencies.append(time.perf_counter() - start)
+        decoded = audio_manager._sizes[handle]
+        length = audio_manager.get_audio_length(handle)
+        audio_manager.unload_audio(handle)
+    cpu = time.process_time() - cpu_start
+    latencies.sort()
+    result = {
+        'format': name,
+        'input_bytes': len(clip),
+        'decoded_bytes': decoded,
+        'seconds': round(length, 3),
+        'p50_ms': round(statistics.median(latencies) * 1000, 3),
+        'p99_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 3),
+        'cpu_ms_per_load': round(cpu / loads * 1000, 3),
+    }
+    print(f"{name:<12} {result['input_bytes']:>10,} B in {result['decoded_bytes']:>10,} B decoded"
+          f" {result['seconds']:>6.2f}s  p50 {result['p50_ms']:>8.3f} ms  p99 {result['p99_ms']:>8.3f} ms"
+          f"  cpu {result['cpu_ms_per_load']:>8.3f} ms/load")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rate', type=int, default=16000, help="mixer and clip sample rate")
+    parser.add_argument('--seconds', type=float, default=3, help="length of the generated clips")
+    parser.add_argument('--loads', type=int, default=200)
+    parser.add_argument('--polly', action='store_true', help="synthesize mp3 and ogg_vorbis clips with Polly")
+    parser.add_argument('--samples', help="directory with mp3.mp3 and ogg_vorbis.ogg clips")
+    parser.add_argument('--output', default='bench_audio_formats.json')
+    args = parser.parse_args()
+
+    audio_manager = AudioManager(memory_budget=1024 * 1024 * 1024, frequency=args.rate)
+    audio_manager.start()
+    import pygame
+    frequency, size, channels = pygame.mixer.get_init()
+    print(f"Mixer at {frequency} Hz, {abs(size)}-bit, {channels} channel(s)")
+
+    pcm = make_pcm(args.seconds, args.rate)
+    clips = {'pcm': pcm, 'wav': make_wav(pcm, args.rate)}
+    if args.polly:
+        clips.update(polly_clips(args.rate))
+    if args.samples:
+        clips.update(sample_clips(args.samples))
+    for output_format in ('mp3', 'ogg_vorbis'):
+        if output_format not in clips:
+            print(f"No {output_format} clip, use --polly or --samples to include it")
+
+    results = [bench(audio_manager, name, clip, args.rate if name == 'pcm' else None, args.loads)
+               for name, clip in clips.items() if clip]
+
+    with open(args.output, 'w') as f:
+        json.dump({'python': platform.python_version(), 'mixer': [frequency, size, channels],
+                   'loads': args.loads, 'results': results}, f, indent=2)
+    print(f"Saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the SSML formatter used on every spoken chat message.
+
+Compares the original per-call implementation of TTSManager.format_text
+against ssml_formatter.format_ssml, both cold (memo cache cleared) and warm
+(repeated chat lines served from the cache).
+
+Usage: python benchmarks/bench_format_text.py [--messages 200000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ssml_formatter import format_ssml
+
+
+def legacy_format_text(text):
+    """The formatter as it shipped before it was precompiled"""
+    emotions = {
+        'high': ['<prosody pitch="+30%">', '</prosody>'],
+        'higher': ['<amazon:effect vocal-tract-length="-80%">', '</amazon:effect>'],
+        'deep': ['<prosody pitch="-30%">', '</prosody>'],
+        'deeper': ['<amazon:effect vocal-tract-length="+80%">', '</amazon:effect>'],
+        'drunk': ['<prosody rate="x-slow">', '</prosody>'],
+        'asthma': ['<amazon:auto-breaths volume="x-loud" frequency="x-high", duration="x-short">', '</amazon:auto-breaths>'],
+        'soft': ['<prosody volume="x-soft">', '</prosody>'],
+        'loud': ['<prosody volume="x-loud">', '</prosody>'],
+        'whisper': ['<amazon:effect name="whispered">', '</amazon:effect>'],
+        'breath': '<amazon:breath duration="x-long" volume="x-loud"/>',
+    }
+
+    import re
+
+    parts = []
+    last_end = 0
+    for match in re.finditer(r'\((\w+)\)', text):
+        if match.start() > last_end:
+            parts.append({'type': 'text', 'content': text[last_end:match.start()]})
+        emotion = match.group(1).lower()
+        if emotion in emotions:
+            parts.append({'type': 'emotion', 'emotion': emotion})
+        last_end = match.end()
+    if last_end < len(text):
+        parts.append({'type': 'text', 'content': text[last_end:]})
+
+    result = []
+    current_effect = None
+    for part in parts:
+        if part['type'] == 'text':
+            result.append(part['content'])
+        elif part['type'] == 'emotion':
+            emotion = part['emotion']
+            if emotion in emotions:
+                if isinstance(emotions[emotion], list):
+                    if current_effect:
+                        result.append(emotions[current_effect][1])
+                    result.append(emotions[emotion][0])
+                    current_effect = emotion
+                else:
+                    result.append(emotions[emotion])
+    if current_effect:
+        result.append(emotions[current_effect][1])
+    return f'<speak>{"".join(result)}</speak>'
+
+
+CHAT_LINES = [
+    "hello chat",
+    "(deep) I am the captain now",
+    "(whisper) don't tell anyone (breath) but I ate the last cookie",
+    "LETS GOOOOO (loud) POGGERS",
+    "(high) hiii (deep) byeee",
+    "that was actually insane (breath) (breath) I need a minute",
+    "(drunk) lets get ready to (breath) (deep) rumble",
+    "lol",
+    "!player1",
+    "(soft) gg everyone, good game (whisper) see you tomorrow",
+    "(unknown) markers like this get dropped (Deep) case does not matter",
+    "why is the streamer like this KEKW",
+]
+
+
+def build_corpus(count, unique, seed=1):
+    """Chat-like corpus where `unique` distinct lines repeat like copypasta does"""
+    rng = random.Random(seed)
+    pool = [f"{rng.choice(CHAT_LINES)} {i}" if i >= len(CHAT_LINES) else CHAT_LINES[i] for i in range(unique)]
+    return [rng.choice(pool) for _ in range(count)]
+
+
+def run(name, func, corpus):
+    start = time.perf_counter()
+    for line in corpus:
+        func(line)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {len(corpus) / elapsed:>14,.0f} msg/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=200000)
+    parser.add_argument('--unique', type=int, default=500, help="distinct lines in the corpus")
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.messages, args.unique)
+    for line in set(corpus):
+        assert format_ssml(line) == legacy_format_text(line), line
+
+    run("legacy format_text", legacy_format_text, corpus)
+    format_ssml.cache_clear()
+    run("format_ssml (uncached)", format_ssml.__wrapped__, corpus)
+    format_ssml.cache_clear()
+    run("format_ssml (memoized)", format_ssml, corpus)
+    print(format_ssml.cache_info())
+
+
+if __name__ == '__main__':
+    main()
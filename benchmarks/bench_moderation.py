@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the moderation filter as the blocklist grows.
+
+Builds blocklists of random words from 10 to 10,000 terms and times
+ModerationFilter.check on chat-like messages (some with leetspeak or
+look-alike spellings of a term), next to a naive filter that searches
+one precompiled regex per term. The automaton's cost per message should
+stay flat with the number of terms while the naive filter's grows
+linearly.
+
+Usage: python benchmarks/bench_moderation.py [--sizes 10 100 1000 10000] [--messages 20000]
+                                              [--naive-messages 500]
+"""
+
+import argparse
+import os
+import random
+import re
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from moderation_filter import ModerationFilter
+
+CHAT_WORDS = ("hello chat that was actually insane lets go gg everyone why is the streamer like this "
+              "KEKW POGGERS lol what a play I need a minute see you tomorrow").split()
+
+DISGUISES = {'a': '@', 'e': '3', 'i': '1', 'o': '0', 's': '$'}
+
+
+def build_terms(count, rng):
+    terms = set()
+    while len(terms) < count:
+        terms.add(''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 10))))
+    return sorted(terms)
+
+
+def disguise(term, rng):
+    """Spell a term the way chat dodges filters"""
+    choice = rng.random()
+    if choice < 0.4:
+        return ''.join(DISGUISES.get(char, char) for char in term)
+    if choice < 0.7:
+        return term.upper()
+    return '.'.join(term)
+
+
+def build_messages(count, terms, rng, hit_rate=0.1):
+    messages = []
+    for _ in range(count):
+        words = [rng.choice(CHAT_WORDS) for _ in range(rng.randint(3, 15))]
+        if rng.random() < hit_rate:
+            words.insert(rng.randrange(len(words) + 1), disguise(rng.choice(terms), rng))
+        messages.append(' '.join(words))
+    return messages
+
+
+def naive_filter(terms):
+    """One regex per term, checked in turn, as a filter without an automaton would"""
+    patterns = [re.compile(r'\b' + re.escape(term) + r'\b', re.IGNORECASE) for term in terms]
+
+    def check(text):
+        for pattern in patterns:
+            text = pattern.sub(lambda match: '*' * len(match.group()), text)
+        return text
+
+    return check
+
+
+def time_per_message(func, messages):
+    start = time.perf_counter()
+    for message in messages:
+        func(message)
+    return (time.perf_counter() - start) / len(messages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000])
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--naive-messages', type=int, default=500, help="messages for the slower regex filter")
+    args = parser.parse_args()
+
+    print(f"{'terms':>8} {'build':>10} {'automaton':>14} {'naive regex':>14} {'caught':>8}")
+    for size in args.sizes:
+        rng = random.Random(size)
+        terms = build_terms(size, rng)
+        messages = build_messages(args.messages, terms, rng)
+
+        start = time.perf_counter()
+        moderation = ModerationFilter(terms=terms)
+        build = time.perf_counter() - start
+        automaton = time_per_message(moderation.check, messages)
+        caught = sum(1 for message in messages[:2000] if moderation.check(message).matches)
+        naive = time_per_message(naive_filter(terms), messages[:args.naive_messages])
+
+        print(f"{size:>8,} {build * 1000:>8.1f}ms {automaton * 1e6:>11.1f} us {naive * 1e6:>11.1f} us "
+              f"{caught / min(2000, len(messages)):>8.1%}")
+
+
+if __name__ == '__main__':
+    main()
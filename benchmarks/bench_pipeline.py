@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark of the chat-to-speech pipeline.
+
+Drives synthetic twitchio messages through the real TwitchBot.event_message
+→ process_message → TTS queue → process_tts → AudioManager path, without
+Twitch, AWS or a sound card: TTS is replaced by a stub with configurable
+latency that returns a short WAV clip, and pygame plays into SDL's dummy
+audio driver. Each chat rate reports dispatch throughput, end-to-end
+latency from receiving a message to its playback starting, thread count
+and RSS. Results are printed and saved as JSON for comparing runs.
+
+Usage: python benchmarks/bench_pipeline.py [--rates 10 100 1000 10000] [--duration 30]
+                                            [--tts-latency 0.25] [--output bench_pipeline.json]
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import threading
+import time
+import wave
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Must be set before main is imported: no sound card, no OBS, no network at startup
+os.environ['SDL_AUDIODRIVER'] = 'dummy'
+os.environ.setdefault('USE_OBS', '0')
+os.environ.setdefault('POLLY_WARM_UP', '0')
+os.environ.setdefault('TTS_CACHE_DIR', '')
+os.environ.setdefault('STATE_JOURNAL_DIR', '')
+os.environ.setdefault('TWITCH_CHANNEL', 'benchmark')
+
+
+def make_clip(seconds, frequency=22050):
+    """A silent WAV clip of the given length"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as clip:
+        clip.setnchannels(1)
+        clip.setsampwidth(2)
+        clip.setframerate(frequency)
+        clip.writeframes(b'\x00\x00' * int(frequency * seconds))
+    return buffer.getvalue()
+
+
+class StubTTS:
+    """Stands in for TTSManager, sleeping like a Polly call and returning a fixed clip"""
+
+    def __init__(self, latency, jitter, clip_seconds, seed=1):
+        self.latency = latency
+        self.jitter = jitter
+        self.clip = make_clip(clip_seconds)
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def iter_speech_chunks(self, text, voice_id='Joanna', output_format='mp3'):
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self._rng.gauss(self.latency, self.jitter))
+        time.sleep(delay)
+        yield self.clip
+
+    def get_voices(self):
+        return []
+
+
+def make_recorder(base):
+    """SocketEmitter that records when each message starts playing instead of emitting"""
+
+    class RecordingEmitter(base):
+        def __init__(self):
+            super().__init__(None)
+            self.started = {}  # message id -> playback start time
+
+        def _send(self, event, data, room):
+            if event != 'play_audio' or not room.startswith('slot_'):
+                return
+            now = time.perf_counter()
+            # Coalesced jobs carry several messages, each one starts with its first playback
+            for word in data['message'].split():
+                if word.startswith('#'):
+                    self.started.setdefault(word[1:], now)
+
+    return RecordingEmitter()
+
+
+def build_message(index, author, sent_at):
+    from twitchio import Chatter, Message
+
+    chatter = Chatter(None, name=author, channel=None, tags=None)
+    return Message(content=f"#{index} this is benchmark message number {index}", author=chatter, channel=None,
+                   tags={'id': str(index), 'tmi-sent-ts': str(int(sent_at * 1000))})
+
+
+def rss_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import resource
+        # ru_maxrss is the peak, in kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run_rate(app, bot, rate, duration, selected_ratio, drain_timeout, rng):
+    recorder = make_recorder(app.SocketEmitter)
+    app.socket_emitter = recorder
+    selected = [slot.current_user for slot in bot.slots]
+    count = max(3, int(rate * duration / 60))
+    interval = 60.0 / rate
+
+    received = {}  # message id -> receive time, only for messages that go to TTS
+    dispatch_time = 0.0
+    start = time.perf_counter()
+    for index in range(count):
+        # Pace the stream like a chat channel at this rate
+        delay = start + index * interval - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        is_selected = rng.random() < selected_ratio
+        author = rng.choice(selected) if is_selected else f"chatter{rng.randrange(50000)}"
+        message = build_message(index, author, time.time())
+        now = time.perf_counter()
+        if is_selected:
+            received[str(index)] = now
+        await bot.event_message(message)
+        dispatch_time += time.perf_counter() - now
+    sent_for = time.perf_counter() - start
+
+    # Let the queues and mixer drain before measuring
+    deadline = time.perf_counter() + drain_timeout
+    while time.perf_counter() < deadline:
+        stats = app.tts_queue.get_stats().values()
+        busy = (any(s['queue_length'] or s['active'] for s in stats)
+                or any(app.audio_manager.is_playing(slot.number) for slot in bot.slots))
+        if not busy:
+            break
+        await asyncio.sleep(0.05)
+
+    latencies = [recorder.started[key] - received_at for key, received_at in received.items() if key in recorder.started]
+    queue_stats = app.tts_queue.get_stats().values()
+    result = {
+        'rate_per_minute': rate,
+        'messages': count,
+        'tts_messages': len(received),
+        'spoken': len(latencies),
+        'coalesced': sum(s['coalesced'] for s in queue_stats),
+        'expired': sum(s['expired'] for s in queue_stats),
+        'dropped': sum(s['dropped'] for s in queue_stats),
+        'messages_per_second': count / sent_for if sent_for else None,
+        'dispatch_us_per_message': dispatch_time / count * 1e6,
+        'latency_p50': percentile(latencies, 0.50),
+        'latency_p99': percentile(latencies, 0.99),
+        'latency_mean': statistics.fmean(latencies) if latencies else None,
+        'threads': threading.active_count(),
+        'rss_bytes': rss_bytes(),
+    }
+
+    # Start the next rate from an idle pipeline
+    for slot in bot.slots:
+        app.tts_queue.clear(slot.number)
+        app.audio_manager.stop_slot(slot.number)
+    for slot in app.tts_queue.slots.values():
+        for counter in ('submitted', 'processed', 'coalesced', 'expired', 'dropped', 'failed'):
+            setattr(slot, counter, 0)
+    return result
+
+
+def print_result(result):
+    def ms(value):
+        return f"{value * 1000:8.1f} ms" if value is not None else "       - ms"
+    print(f"{result['rate_per_minute']:>6}/min  {result['messages_per_second']:>8.1f} msg/s  "
+          f"dispatch {result['dispatch_us_per_message']:>7.1f} us  "
+          f"p50 {ms(result['latency_p50'])}  p99 {ms(result['latency_p99'])}  "
+          f"spoken {result['spoken']}/{result['tts_messages']}  "
+          f"threads {result['threads']:>3}  rss {result['rss_bytes'] / 1024 / 1024:6.1f} MB")
+
+
+async def run(args):
+    import main as app
+
+    app.tts_manager = StubTTS(args.tts_latency, args.tts_jitter, args.clip_seconds)
+    app.control_obs_audio_filter = lambda user_number, enable, channel=None: None  # OBS is off, skip its per-clip warning
+    bot = app.twitchbot = app.TwitchBot()
+    for slot in bot.slots:
+        bot.slots.set_user(slot.number, f"selected{slot.number}")
+        slot.tts_enabled = True
+
+    rng = random.Random(args.seed)
+    results = []
+    for rate in args.rates:
+        result = await run_rate(app, bot, rate, args.duration, args.selected_ratio, args.drain_timeout, rng)
+        print_result(result)
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rates', type=int, nargs='+', default=[10, 100, 1000, 10000],
+                        help='chat messages per minute to replay')
+    parser.add_argument('--duration', type=float, default=30, help='seconds of chat per rate')
+    parser.add_argument('--selected-ratio', type=float, default=0.2,
+                        help='fraction of messages sent by a selected chatter')
+    parser.add_argument('--tts-latency', type=float, default=0.25, help='mean stub TTS latency in seconds')
+    parser.add_argument('--tts-jitter', type=float, default=0.05)
+    parser.add_argument('--clip-seconds', type=float, default=0.5, help='length of each spoken clip')
+    parser.add_argument('--drain-timeout', type=float, default=60, help='max seconds to wait for playback to finish')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default='bench_pipeline.json')
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {key: value for key, value in vars(args).items() if key != 'output'},
+        'env': {name: os.getenv(name) for name in ('SLOT_COUNT', 'TTS_WORKERS', 'TTS_QUEUE_DEPTH', 'TTS_DROP_POLICY',
+                                                   'TTS_COALESCE_CHARS', 'TTS_MAX_AGE', 'AUDIO_EXCLUSIVE')},
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved results to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the per-message slot routing done in TwitchBot.process_message.
+
+Routes a synthetic chat stream where ~99% of messages come from chatters who
+aren't selected in any slot, at 1, 3 and 32 slots. The SlotTable lookup is
+compared with the old approach of comparing the author against each slot's
+selected user in turn.
+
+Usage: python benchmarks/bench_slot_dispatch.py [--messages 500000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from slot_manager import SlotTable
+
+
+def build_messages(table, count, selected_ratio=0.01, seed=1):
+    rng = random.Random(seed)
+    selected = [slot.current_user for slot in table]
+    messages = []
+    for i in range(count):
+        if rng.random() < selected_ratio:
+            name = rng.choice(selected)
+        else:
+            name = f"chatter{rng.randrange(50000)}"
+        messages.append(SimpleNamespace(content=f"message {i}", author=SimpleNamespace(name=name)))
+    return messages
+
+
+def dispatch_table(table, message):
+    """Routing as done by process_message"""
+    if table.for_passphrase(message.content) is not None:
+        return None
+    return table.for_author(message.author.name)
+
+
+def dispatch_linear(table, message):
+    """The previous routing: check each passphrase, then each selected user"""
+    slots = list(table)
+    if message.content in [slot.keypassphrase for slot in slots]:
+        return None
+    for slot in slots:
+        if message.author.name == slot.current_user:
+            return slot
+    return None
+
+
+def run(name, func, table, messages):
+    start = time.perf_counter()
+    routed = 0
+    for message in messages:
+        if func(table, message) is not None:
+            routed += 1
+    elapsed = time.perf_counter() - start
+    print(f"{name:<10} {len(table):>3} slots  {elapsed / len(messages) * 1e9:>8.0f} ns/msg  ({routed} routed)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=500000)
+    args = parser.parse_args()
+
+    for count in (1, 3, 32):
+        table = SlotTable(count)
+        for slot in table:
+            table.set_user(slot.number, f"selected{slot.number}")
+        messages = build_messages(table, args.messages)
+        run("table", dispatch_table, table, messages)
+        run("linear", dispatch_linear, table, messages)
+
+
+if __name__ == '__main__':
+    main()
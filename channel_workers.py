@@ -0,0 +1,192 @@
+"""
+Multi-channel mode, with the channels sharded across worker processes.
+
+When TWITCH_CHANNELS lists several channels, the web front end in main.py
+doesn't run a bot itself. It starts CHANNEL_WORKERS processes that each
+run the whole chat → TTS → playback pipeline for their share of the
+channels, so a busy channel only competes with the channels in its own
+process. Workers send their Socket.IO events back over one
+multiprocessing queue and the front end emits them into that channel's
+rooms; dashboard commands go the other way over a queue per worker.
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+
+from rich import print
+
+from socket_emitter import SocketEmitter
+
+STOP = None  # put on a worker's command queue to shut the worker down
+
+
+def parse_channels(value):
+    """Channel names from a comma separated list, lowercased and without duplicates"""
+    channels = []
+    for channel in value.split(','):
+        channel = channel.strip().lstrip('#').lower()
+        if channel and channel not in channels:
+            channels.append(channel)
+    return channels
+
+
+def shard_channels(channels, workers):
+    """Spread the channels round-robin over at most `workers` shards"""
+    workers = max(1, min(workers, len(channels)))
+    return [channels[i::workers] for i in range(workers)]
+
+
+class QueueEmitter(SocketEmitter):
+    """SocketEmitter for a worker process, passes events to the front end instead of emitting them"""
+
+    def __init__(self, outbox):
+        super().__init__(None)
+        self.outbox = outbox
+
+    def emit(self, event, data, room):
+        self.events += 1
+        self.outbox.put(('emit', event, data, room))
+
+
+def serve_commands(commands, handlers, on_stop):
+    """Apply dashboard commands sent by the front end on a background thread, on_stop() is called for STOP"""
+    def run():
+        while True:
+            command = commands.get()
+            if command is STOP:
+                on_stop()
+                return
+            name, channel, value = command
+            handler = handlers.get(name)
+            if handler is None:
+                print(f"[red]Unknown dashboard command '{name}' for #{channel}[/red]")
+                continue
+            try:
+                handler(value, channel)
+            except Exception as e:
+                print(f"[red]Error handling '{name}' for #{channel}: {e}[/red]")
+
+    thread = threading.Thread(target=run, name="channel-commands", daemon=True)
+    thread.start()
+    return thread
+
+
+def report_status(outbox, index, get_status, interval=2):
+    """Send this worker's startup status to the front end every interval seconds"""
+    stop = threading.Event()
+
+    def run():
+        while not stop.is_set():
+            outbox.put(('status', index, get_status()))
+            stop.wait(interval)
+
+    threading.Thread(target=run, name="channel-status", daemon=True).start()
+    return stop
+
+
+def watch_parent(on_exit, interval=1):
+    """Call on_exit() on a background thread once the front end that started this worker is gone.
+
+    daemon processes are only cleaned up when the front end exits normally,
+    a killed front end would otherwise leave its workers speaking chat.
+    """
+    parent = multiprocessing.parent_process()
+    ppid = os.getppid()
+
+    def run():
+        while (parent is None or parent.is_alive()) and os.getppid() == ppid:
+            time.sleep(interval)
+        print("[bold red]The front end has exited[/bold red]")
+        on_exit()
+
+    thread = threading.Thread(target=run, name="channel-watchdog", daemon=True)
+    thread.start()
+    return thread
+
+
+class ChannelSupervisor:
+    """Starts the worker processes and routes events and commands between them and the front end.
+
+    target(index, channels, outbox, commands) is run in each worker process.
+    emit(event, data, room) is called on the front end for every event a
+    worker sends, and on_status(name, status) whenever a worker reports in.
+    """
+
+    def __init__(self, target, channels, workers, emit, on_status=None):
+        self.target = target
+        self.emit = emit
+        self.on_status = on_status
+        self.shards = shard_channels(channels, workers)
+        # Spawned workers start from a clean interpreter, a fork would inherit the front end's threads and locks
+        self._context = multiprocessing.get_context('spawn')
+        self.outbox = self._context.Queue()
+        self.commands = [self._context.Queue() for _ in self.shards]
+        self.owners = {channel: index for index, shard in enumerate(self.shards) for channel in shard}
+        self.processes = []
+        self._statuses = {}  # worker index -> last startup status it reported
+        self._relay = None
+
+    def worker_name(self, index):
+        return f"worker-{index + 1}"
+
+    def start(self):
+        for index, shard in enumerate(self.shards):
+            process = self._context.Process(target=self.target, args=(index, shard, self.outbox, self.commands[index]),
+                                            name=f"channel-{self.worker_name(index)}", daemon=True)
+            process.start()
+            self.processes.append(process)
+            print(f"[bold cyan]Started {self.worker_name(index)} (pid {process.pid}) for #{', #'.join(shard)}[/bold cyan]")
+        if self._relay is None:
+            self._relay = threading.Thread(target=self._relay_events, name="channel-relay", daemon=True)
+            self._relay.start()
+
+    def stop(self, timeout=5):
+        """Ask every worker to shut down, killing the ones still running after timeout seconds"""
+        # SDL catches SIGTERM in processes that opened the mixer, so terminate() would be ignored
+        for index, process in enumerate(self.processes):
+            if process.is_alive():
+                self.commands[index].put(STOP)
+        deadline = time.monotonic() + timeout
+        for process in self.processes:
+            process.join(max(0, deadline - time.monotonic()))
+            if process.is_alive():
+                print(f"[yellow]{process.name} (pid {process.pid}) didn't stop, killing it[/yellow]")
+                process.kill()
+                process.join()
+
+    def send(self, channel, name, value):
+        """Hand a dashboard command to the worker that owns the channel, returns False for unknown channels"""
+        index = self.owners.get(channel)
+        if index is None:
+            return False
+        self.commands[index].put((name, channel, value))
+        return True
+
+    def get_status(self):
+        workers = {}
+        for index, shard in enumerate(self.shards):
+            alive = index < len(self.processes) and self.processes[index].is_alive()
+            status = self._statuses.get(index, {})
+            workers[self.worker_name(index)] = {
+                'channels': shard,
+                'alive': alive,
+                'ready': alive and status.get('ready', False),
+                'subsystems': status.get('subsystems', {}),
+            }
+        return workers
+
+    def _relay_events(self):
+        while True:
+            kind, *payload = self.outbox.get()
+            try:
+                if kind == 'emit':
+                    self.emit(*payload)
+                elif kind == 'status':
+                    index, status = payload
+                    self._statuses[index] = status
+                    if self.on_status:
+                        self.on_status(self.worker_name(index), status)
+            except Exception as e:
+                print(f"[red]Error relaying '{kind}' from a channel worker: {e}[/red]")
@@ -0,0 +1,87 @@
+import random
+import time
+from collections import OrderedDict
+
+
+class ActiveChatterIndex:
+    """Set of recently active chatters with O(1) touch, removal and random pick.
+
+    Chatters are kept in last-seen order so expiry only ever looks at the
+    oldest entries, and mirrored in a dense list so a uniform random pick
+    doesn't need to copy the whole pool. Timestamps come from
+    time.monotonic() and must be passed in non-decreasing order.
+    """
+
+    def __init__(self, seconds_active=450, max_users=2000):
+        self.seconds_active = seconds_active
+        self.max_users = max_users
+        self._last_seen = OrderedDict()  # name -> last seen time, oldest first
+        self._names = []  # dense list of names for random sampling
+        self._positions = {}  # name -> index in _names
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return name in self._positions
+
+    def __iter__(self):
+        return iter(self._last_seen)
+
+    def touch(self, name, now=None):
+        """Mark a chatter as active and expire stale ones, returns the removed names"""
+        if now is None:
+            now = time.monotonic()
+        if name in self._last_seen:
+            self._last_seen.move_to_end(name)
+        else:
+            self._positions[name] = len(self._names)
+            self._names.append(name)
+        self._last_seen[name] = now
+        return self.expire(now)
+
+    def last_seen(self, name):
+        return self._last_seen.get(name)
+
+    def remove(self, name):
+        """Remove a chatter, returns False if they weren't in the index"""
+        if name not in self._last_seen:
+            return False
+        del self._last_seen[name]
+        self._discard_name(name)
+        return True
+
+    def expire(self, now=None):
+        """Drop everyone inactive for longer than seconds_active and enforce max_users"""
+        if now is None:
+            now = time.monotonic()
+        threshold = now - self.seconds_active
+        removed = []
+        last_seen = self._last_seen
+        while last_seen:
+            name, seen = next(iter(last_seen.items()))
+            if seen >= threshold and len(last_seen) <= self.max_users:
+                break
+            last_seen.popitem(last=False)
+            self._discard_name(name)
+            removed.append(name)
+        return removed
+
+    def random_choice(self, rng=random):
+        """Pick a uniformly random chatter, or None if the index is empty"""
+        if not self._names:
+            return None
+        return self._names[rng.randrange(len(self._names))]
+
+    def clear(self):
+        self._last_seen.clear()
+        self._names.clear()
+        self._positions.clear()
+
+    def _discard_name(self, name):
+        # Swap the last name into the freed position to keep the list dense
+        index = self._positions.pop(name)
+        last = self._names.pop()
+        if last != name:
+            self._names[index] = last
+            self._positions[last] = index
@@ -9,62 +9,202 @@ import signal
 import asyncio
 import threading
 import time
-import random
+import aiohttp
 import requests as http_requests
 import json
-from datetime import datetime, timedelta
-import pytz
+import hashlib
 import dotenv
 
-from flask import Flask, render_template, session, request
-from flask_socketio import SocketIO, emit
+from flask import Flask, Response, abort, jsonify, render_template, session, request
+from flask_socketio import SocketIO, emit, join_room
 from twitchio.ext import commands
 from twitchio import Message as Message
+import twitchio.websocket
 
 from tts_manager import TTSManager
 from audio_manager import AudioManager
+from audio_cache import AudioCache
+from tts_queue_manager import TTSQueueManager
+from slot_manager import SlotTable
+from obs_manager import OBSManager
+from socket_emitter import SocketEmitter, dashboard_room, slot_room
+from slot_views import SLOT_SNAPSHOT, SLOT_UPDATE, SlotViews
+from activity_registry import ActivityRegistry
+from moderation_filter import ACTIONS as MODERATION_ACTION_NAMES, ModerationFilter
+import voice_effects
+import metrics
+import channel_workers
+from startup import StartupTracker
+from state_journal import StateJournal
 
 from rich import print
 
 # Load environment variables
 dotenv.load_dotenv(".env")
 
-if os.getenv('USE_OBS', '0') == '1':
-    from obswebsocket import obsws, requests
-    obs = None  # Global OBS instance
-    try:
-        obs = obsws(
-            host=os.getenv('OBS_WEBSOCKET_HOST', 'localhost'),
-            port=int(os.getenv('OBS_WEBSOCKET_PORT', 4455)),
-            password=os.getenv('OBS_WEBSOCKET_PASSWORD', '') if os.getenv('USE_OBS_WEBSOCKET_PASSWORD', '0') == '1' else ''
-        )
-        obs.connect()
-        print("[bold green]Connected to OBS WebSocket successfully[/bold green]")
-    except Exception as e:
-        print(f"[red]Error connecting to OBS WebSocket: {e}[/red]")
-        obs = None
-else:
-    obs = None  # OBS not used
+# Audio, Polly, OBS and Twitch come up concurrently once the app starts, see start_subsystems()
+startup = StartupTracker()
+STARTUP_TIMEOUT = float(os.getenv('STARTUP_TIMEOUT', 10))
+
+def channel_env(channel, name, default=None):
+    """A setting for one channel, <CHANNEL>_<NAME> overrides <NAME> so each streamer can have their own"""
+    if channel:
+        value = os.getenv(f"{channel.upper()}_{name}")
+        if value is not None:
+            return value
+    return os.getenv(name, default)
+
+def create_obs_manager(channel):
+    """OBS connection for a channel, or None when OBS isn't used"""
+    if channel_env(channel, 'USE_OBS', '0') != '1':
+        return None  # OBS not used
+    # OBS commands are sent from a background dispatcher thread, it connects during startup
+    return OBSManager(
+        host=channel_env(channel, 'OBS_WEBSOCKET_HOST', 'localhost'),
+        port=int(channel_env(channel, 'OBS_WEBSOCKET_PORT', 4455)),
+        password=channel_env(channel, 'OBS_WEBSOCKET_PASSWORD', '') if channel_env(channel, 'USE_OBS_WEBSOCKET_PASSWORD', '0') == '1' else '',
+        disable_delay=float(os.getenv('OBS_FILTER_DISABLE_DELAY', 0.5)),
+        timeout=STARTUP_TIMEOUT
+    )
+
+# Format Polly is asked for, and the rate the mixer is opened at so clips need no resampling.
+# pcm skips decoding entirely but Polly only offers it at 8000 or 16000 Hz.
+AUDIO_FORMAT = os.getenv('AUDIO_FORMAT', 'mp3')
+AUDIO_SAMPLE_RATE = int(os.getenv('AUDIO_SAMPLE_RATE') or (16000 if AUDIO_FORMAT == 'pcm' else 22050))
+PCM_RATE = AUDIO_SAMPLE_RATE if AUDIO_FORMAT == 'pcm' else None
+
+def create_audio_cache(worker=None, workers=1):
+    """Cache of synthesized audio, a channel worker gets its own directory and share of the disk budget"""
+    cache_dir = os.getenv('TTS_CACHE_DIR', '.tts_cache') or None
+    disk_bytes = int(os.getenv('TTS_CACHE_DISK_MB', 256)) * 1024 * 1024
+    if cache_dir and worker is not None:
+        # Each process indexes and evicts its directory on its own, so workers can't share one
+        cache_dir = os.path.join(cache_dir, f"worker-{worker}")
+        disk_bytes //= workers
+    return AudioCache(cache_dir=cache_dir,
+                      memory_bytes=int(os.getenv('TTS_CACHE_MEMORY_MB', 32)) * 1024 * 1024,
+                      disk_bytes=disk_bytes)
 
 # Initialize TTS and Audio Managers
+audio_cache = create_audio_cache()
 tts_manager = TTSManager(aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
                          aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-                        region_name=os.getenv('AWS_REGION', 'us-east-1'))
-audio_manager = AudioManager()
+                        region_name=os.getenv('AWS_REGION', 'us-east-1'),
+                        cache=audio_cache,
+                        max_pool_connections=int(os.getenv('POLLY_MAX_CONNECTIONS', 10)),
+                        connect_timeout=float(os.getenv('POLLY_CONNECT_TIMEOUT', 3)),
+                        read_timeout=float(os.getenv('POLLY_READ_TIMEOUT', 10)),
+                        endpoint_url=os.getenv('POLLY_ENDPOINT_URL') or None,
+                        chunk_chars=int(os.getenv('TTS_CHUNK_CHARS', 120)),
+                        chunk_workers=int(os.getenv('TTS_CHUNK_WORKERS', 3)),
+                        backend=os.getenv('TTS_BACKEND', 'polly'),
+                        local_max_chars=int(os.getenv('TTS_LOCAL_MAX_CHARS', 0)),
+                        latency_budget=float(os.getenv('TTS_LATENCY_BUDGET', 1.5)),
+                        output_format=AUDIO_FORMAT,
+                        sample_rate=AUDIO_SAMPLE_RATE)
+audio_manager = AudioManager(memory_budget=int(os.getenv('AUDIO_MEMORY_MB', 64)) * 1024 * 1024,
+                             duck_volume=float(os.getenv('AUDIO_DUCK_VOLUME')) if os.getenv('AUDIO_DUCK_VOLUME') else None,
+                             exclusive=os.getenv('AUDIO_EXCLUSIVE', '0') == '1',
+                             frequency=AUDIO_SAMPLE_RATE)
 
 # Define the Twitch channel name
-TWITCH_CHANNEL_NAME = os.getenv('TWITCH_CHANNEL')
+# Optional local Twitch IRC stand-in for offline load tests (tools/chat_replay.py)
+TWITCH_IRC_HOST = os.getenv('TWITCH_IRC_HOST')
+if TWITCH_IRC_HOST:
+    # twitchio has no setting for the IRC address, so point its module constant at the stand-in
+    twitchio.websocket.HOST = TWITCH_IRC_HOST
+
+# Multi-channel mode: TWITCH_CHANNELS lists the channels, which are spread over
+# CHANNEL_WORKERS processes that each run a bot (see channel_workers.py)
+TWITCH_CHANNELS = channel_workers.parse_channels(os.getenv('TWITCH_CHANNELS', ''))
+MULTI_CHANNEL = bool(TWITCH_CHANNELS)
+CHANNEL_WORKERS = int(os.getenv('CHANNEL_WORKERS') or len(TWITCH_CHANNELS) or 1)
+
+TWITCH_CHANNEL_NAME = TWITCH_CHANNELS[0] if MULTI_CHANNEL else os.getenv('TWITCH_CHANNEL')
 if TWITCH_CHANNEL_NAME is None:
     raise ValueError("TWITCH_CHANNEL environment variable not set")
 
+# Channels served by this process, a channel worker narrows it to its own shard
+CHANNELS = TWITCH_CHANNELS or [TWITCH_CHANNEL_NAME.lower()]
+
+# Number of user slots shown on the dashboard
+SLOT_COUNT = int(os.getenv('SLOT_COUNT', 3))
+SLOT_NUMBERS = [str(i) for i in range(1, SLOT_COUNT + 1)]
+
+def slot_key(channel, user_number):
+    """Key of a slot in the TTS queue and the mixer, qualified by its channel in multi-channel mode"""
+    return f"{channel}/{user_number}" if MULTI_CHANNEL else user_number
+
+def split_slot_key(key):
+    """Channel and slot number of a slot key"""
+    channel, _, user_number = key.rpartition('/')
+    return channel or CHANNELS[0], user_number
+
+def room_channel(channel):
+    """Channel that Socket.IO rooms are scoped to, None keeps the single-channel room names"""
+    return channel if MULTI_CHANNEL else None
+
+# OBS state of every channel served by this process, the multi-channel front end has none
+obs_managers = {} if MULTI_CHANNEL else {CHANNELS[0]: create_obs_manager(CHANNELS[0])}
+
 # Global instance for the bot
 twitchbot = None
+bot_ready = threading.Event()  # set by event_ready once the bot has joined its channels
+
+# Last-seen time of every chatter in the channel
+activity_registry = ActivityRegistry()
+
+# Blocklist applied to selected chatters' messages before they are shown and spoken
+moderation = ModerationFilter(path=os.getenv('MODERATION_TERMS_FILE', 'moderation_terms.txt') or None,
+                              replacement=os.getenv('MODERATION_REPLACEMENT', 'beep'))
+
+def moderation_actions():
+    """What to do with a blocked term for every slot, MODERATION_ACTION_N overrides MODERATION_ACTION"""
+    actions = {}
+    for channel in CHANNELS:
+        default = channel_env(channel, 'MODERATION_ACTION', 'mask')
+        for user_number in SLOT_NUMBERS:
+            action = channel_env(channel, f'MODERATION_ACTION_{user_number}') or default
+            if action not in MODERATION_ACTION_NAMES:
+                raise ValueError(f"Unknown moderation action '{action}' for slot {user_number} of #{channel}, "
+                                 f"expected one of {MODERATION_ACTION_NAMES}")
+            actions[(channel, user_number)] = action
+    return actions
+
+MODERATION_ACTIONS = moderation_actions()
+
+def slot_effects():
+    """Voice effect chain of every slot that has one, VOICE_EFFECTS_N overrides VOICE_EFFECTS"""
+    effects = {}
+    for channel in CHANNELS:
+        default = channel_env(channel, 'VOICE_EFFECTS', '')
+        for user_number in SLOT_NUMBERS:
+            chain = voice_effects.parse_effects(channel_env(channel, f'VOICE_EFFECTS_{user_number}') or default)
+            if chain is not None:
+                effects[(channel, user_number)] = chain
+    if effects and not voice_effects.available():
+        print("[yellow]Warning: VOICE_EFFECTS needs numpy (pip install numpy), using the OBS filters instead[/yellow]")
+        return {}
+    return effects
+
+# Slots with in-process effects are rendered locally instead of toggling their OBS filter
+SLOT_EFFECTS = slot_effects()
 
 # Initialize the Flask app and SocketIO
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('FLASK_SECRET_KEY', 'chatgodappsecret!')
 socketio = SocketIO(app, async_mode="threading", cors_allowed_origins="*")
 
+# Sends slot events only to the dashboard and that slot's overlays
+socket_emitter = SocketEmitter(socketio, batch_interval=float(os.getenv('SOCKETIO_BATCH_INTERVAL', 0)))
+
+# What each slot currently shows, sent to clients as they connect
+slot_views = SlotViews()
+
+# Worker processes of multi-channel mode, started by start_subsystems()
+channel_supervisor = None
+client_channels = {}  # Socket.IO sid -> channel shown by that dashboard or overlay
+
 # Flag file to ensure we only initialize the bot once
 BOT_FLAG_FILE = ".bot_initialized"
 
@@ -74,6 +214,10 @@ def refresh_twitch_token():
     client_id = os.getenv('TWITCH_CLIENT_ID')
     client_secret = os.getenv('TWITCH_CLIENT_SECRET')
     
+    if TWITCH_IRC_HOST:
+        print(f"[yellow]Using the IRC stand-in at {TWITCH_IRC_HOST}, skipping token refresh[/yellow]")
+        return True
+    
     if not all([refresh_token, client_id, client_secret]):
         print("[red]Missing required Twitch credentials for token refresh![/red]")
         print(f"[yellow]TWITCH_REFRESH_TOKEN: {'✓' if refresh_token else '✗'}[/yellow]")
@@ -93,7 +237,7 @@ def refresh_twitch_token():
             'client_secret': client_secret
         }
         
-        response = http_requests.post(url, data=data)
+        response = http_requests.post(url, data=data, timeout=STARTUP_TIMEOUT)
         
         if response.status_code == 200:
             token_data = response.json()
@@ -162,169 +306,113 @@ def update_env_file(new_access_token, new_refresh_token):
 class TwitchBot(commands.Bot):
     """Twitch bot implementation"""
     
-    # User tracking
-    current_user_1 = None
-    current_user_2 = None
-    current_user_3 = None
-    
-    # TTS settings
-    tts_enabled_1 = True
-    tts_enabled_2 = True
-    tts_enabled_3 = True
-    
-    # Voice settings - default to Joanna for all users
-    voice_1 = 'Joanna'
-    voice_2 = 'Joanna'
-    voice_3 = 'Joanna'
-    
-    # Registration commands
-    keypassphrase_1 = "!player1"
-    keypassphrase_2 = "!player2"
-    keypassphrase_3 = "!player3"
-    
-    # User pools
-    user_pool_1 = {}  # dict of username and time last chatted
-    user_pool_2 = {}  # dict of username and time last chatted
-    user_pool_3 = {}  # dict of username and time last chatted
-    
     # Settings
     seconds_active = 450  # seconds until a chatter is booted from the list
     max_users = 2000  # max users in user pool
 
-    def __init__(self):
+    def __init__(self, channels=None):
         """Initialize the bot with Twitch credentials"""
         self._shutdown = False
+        self.channel_names = channels or CHANNELS
+        
+        # Every channel has its own user slots with their selected user, TTS setting, voice and user pool
+        self.channel_slots = {channel: SlotTable(SLOT_COUNT, self.seconds_active, self.max_users)
+                              for channel in self.channel_names}
+        self.slots = self.channel_slots[self.channel_names[0]]  # the only channel outside multi-channel mode
+        
         super().__init__(
             token=str(os.getenv("TWITCH_ACCESS_TOKEN")),
             prefix='!', 
-            initial_channels=[TWITCH_CHANNEL_NAME]
+            initial_channels=self.channel_names
         )
+        if TWITCH_IRC_HOST:
+            # The stand-in doesn't check tokens, a preset nick skips validating it with Twitch
+            self._http.nick = os.getenv('TWITCH_BOT_NICK', 'chatgodbot').lower()
+
+    async def connect(self):
+        """Connect to Twitch IRC, or to the local stand-in when TWITCH_IRC_HOST is set"""
+        if TWITCH_IRC_HOST and self._http.session is None:
+            # twitchio normally opens its session while validating the token
+            self._http.session = aiohttp.ClientSession()
+        await super().connect()
 
     async def event_ready(self):
         """Called when the bot is ready"""
         # # Play a welcome message
-        # output_path = tts_manager.text_to_speech("(drunk) Lets get ready to (breath) (deep) rumble.", voice_id='Brian')
-        # audio_manager.load_audio(output_path)
-        # audio_manager.play_audio(output_path)
-        # audio_manager.unload_audio(output_path)
+        # audio = tts_manager.text_to_speech("(drunk) Lets get ready to (breath) (deep) rumble.", voice_id='Brian')
+        # handle = audio_manager.load_audio(audio)
+        # audio_manager.play_audio(handle)
         
         print(f" * Logged in as {self.nick}")
         print(f" * Connected to channel: {', '.join([channel.name for channel in self.connected_channels])}")
+        if not bot_ready.is_set():
+            bot_ready.set()
+            startup.finish('twitch')
 
     async def event_message(self, message):
         """Handle incoming messages"""
+        metrics.chat_messages.inc()
+        if message.author is not None:
+            activity_registry.touch(message.author.name)
+        sent_at = (message.tags or {}).get('tmi-sent-ts')
+        if sent_at:
+            # Twitch stamps messages in epoch milliseconds when it relays them
+            metrics.chat_dispatch_seconds.observe(max(0.0, time.time() - int(sent_at) / 1000))
         await self.process_message(message)
 
+    def slots_for(self, channel):
+        """The slot table of a channel, or None if the bot isn't in it"""
+        return self.channel_slots.get(channel)
+
     async def process_message(self, message):
         """Process incoming messages from chat"""
+        channel = message.channel.name if message.channel is not None else self.channel_names[0]
+        slots = self.slots_for(channel)
+        if slots is None:
+            return
+        
         # Check for registration commands
-        if message.content in [self.keypassphrase_1, self.keypassphrase_2, self.keypassphrase_3]:
-            self.register_user(message)
+        slot = slots.for_passphrase(message.content)
+        if slot is not None:
+            self.register_user(slot, message, channel)
             return
             
         # Process messages from selected users
-        if message.author.name == self.current_user_1:
-            socketio.emit('message_send', {
-                'message': f"{message.content}",
-                'current_user': f"{self.current_user_1}",
-                'user_number': "1"
-            })
-            if self.tts_enabled_1:
-                # Enable OBS audio filter for this user
-                control_obs_audio_filter("1", True)
-                threading.Thread(
-                    target=process_tts,
-                    args=(message.content, "1")
-                ).start()
-                
-        elif message.author.name == self.current_user_2:
-            socketio.emit('message_send', {
-                'message': f"{message.content}",
-                'current_user': f"{self.current_user_2}",
-                'user_number': "2"
-            })
-            if self.tts_enabled_2:
-                # Enable OBS audio filter for this user
-                control_obs_audio_filter("2", True)
-                threading.Thread(
-                    target=process_tts,
-                    args=(message.content, "2")
-                ).start()
-                
-        elif message.author.name == self.current_user_3:
-            socketio.emit('message_send', {
-                'message': f"{message.content}",
-                'current_user': f"{self.current_user_3}",
-                'user_number': "3"
-            })
-            if self.tts_enabled_3:
-                # Enable OBS audio filter for this user
-                control_obs_audio_filter("3", True)
-                threading.Thread(
-                    target=process_tts,
-                    args=(message.content, "3")
-                ).start()
-
-    def register_user(self, message):
-        """Register a user to the appropriate pool based on command"""
-        user_pool = None
-        if message.content == self.keypassphrase_1:
-            user_pool = self.user_pool_1
-        elif message.content == self.keypassphrase_2:
-            user_pool = self.user_pool_2
-        elif message.content == self.keypassphrase_3:
-            user_pool = self.user_pool_3
-        else:
+        slot = slots.for_author(message.author.name)
+        if slot is None:
             return
-            
-        # Remove user if already in pool (to update timestamp)
-        if message.author.name.lower() in user_pool:
-            user_pool.pop(message.author.name.lower())
-            
-        # Add user to pool with current timestamp
-        user_pool[message.author.name.lower()] = message.timestamp
         
-        # Check for inactive users or if pool is too large
-        self.clean_user_pool(user_pool)
+        verdict = moderation.check(message.content, MODERATION_ACTIONS[(channel, slot.number)])
+        if verdict.action:
+            print(f"[yellow]Moderation: {verdict.action} {verdict.matches} blocked term(s) from {slot.current_user}[/yellow]")
+        publish_slot(slot.number, channel, current_user=slot.current_user, message=verdict.display)
+        if slot.tts_enabled and verdict.spoken:
+            key = slot_key(channel, slot.number)
+            metrics.tts_submitted.inc(user_number=key)
+            tts_queue.submit(key, verdict.spoken)
 
-    def clean_user_pool(self, user_pool):
-        """Remove inactive users from the pool"""
-        if not user_pool:
-            return
-            
-        activity_threshold = datetime.now(pytz.utc) - timedelta(seconds=self.seconds_active)
-        
-        # Get the oldest user (first in the dict)
-        if user_pool:
-            oldest_user = list(user_pool.keys())[0]
-            # Check if user is inactive or pool is too large
-            if (user_pool[oldest_user].replace(tzinfo=pytz.utc) < activity_threshold or 
-                len(user_pool) > self.max_users):
-                user_pool.pop(oldest_user)
-                if len(user_pool) == self.max_users:
-                    print(f"[yellow]{oldest_user} was removed due to hitting max users[/yellow]")
-                else:
-                    print(f"[yellow]{oldest_user} was removed due to not talking for {self.seconds_active} seconds[/yellow]")
-
-    def random_user(self, user_number):
+    def register_user(self, slot, message, channel=None):
+        """Register a user to the pool of the slot whose command they typed"""
+        # Add or refresh the user, expiring inactive users and enforcing the pool size
+        name = message.author.name.lower()
+        removed = slot.user_pool.touch(name)
+        if state_journal is not None:
+            state_journal.record_seen(channel or self.channel_names[0], slot.number, name)
+        if removed:
+            print(f"[yellow]Removed {len(removed)} user(s) who didn't talk for {self.seconds_active} seconds or exceeded {self.max_users} users[/yellow]")
+
+    def random_user(self, user_number, channel=None):
         """Pick a random user from the appropriate pool"""
         try:
-            user_pool = None
-            if user_number == "1":
-                user_pool = self.user_pool_1
-                if user_pool:
-                    self.current_user_1 = random.choice(list(user_pool.keys()))
-                    emit_user_update(user_number, self.current_user_1)
-            elif user_number == "2":
-                user_pool = self.user_pool_2
-                if user_pool:
-                    self.current_user_2 = random.choice(list(user_pool.keys()))
-                    emit_user_update(user_number, self.current_user_2)
-            elif user_number == "3":
-                user_pool = self.user_pool_3
-                if user_pool:
-                    self.current_user_3 = random.choice(list(user_pool.keys()))
-                    emit_user_update(user_number, self.current_user_3)
+            slots = self.slots_for(channel) if channel else self.slots
+            slot = slots.get(user_number) if slots is not None else None
+            if slot is None:
+                return
+            slot.user_pool.expire()
+            if slot.user_pool:
+                slots.set_user(user_number, slot.user_pool.random_choice())
+                journal_slot(channel or self.channel_names[0], slot)
+                emit_user_update(user_number, slot.current_user, channel)
         except Exception as e:
             print(f"[red]Error selecting random user: {e}[/red]")
 
@@ -338,41 +426,183 @@ class TwitchBot(commands.Bot):
         await super().close()
 
 
+def create_state_journal():
+    """Journal of slot state for warm restarts, or None when STATE_JOURNAL_DIR is empty"""
+    directory = os.getenv('STATE_JOURNAL_DIR', '.state')
+    if not directory:
+        return None
+    return StateJournal(directory, TwitchBot.seconds_active, TwitchBot.max_users,
+                        snapshot_interval=float(os.getenv('STATE_SNAPSHOT_INTERVAL', 60)))
+
+# Channel workers open their own journal for their channels
+state_journal = None if MULTI_CHANNEL else create_state_journal()
+
+def journal_slot(channel, slot):
+    """Journal a slot's user, voice and TTS setting so they survive a restart"""
+    if state_journal is not None:
+        state_journal.record_slot(channel, slot)
+
+def restore_state(bot):
+    """Put back the slots and still-active chatter pools journaled before the last restart"""
+    if state_journal is None:
+        return
+    started = time.perf_counter()
+    restored = 0
+    chatters = 0
+    # Pools were journaled in wall clock time, the chatter index runs on the monotonic clock
+    offset = time.monotonic() - time.time()
+    for channel, slots in bot.channel_slots.items():
+        state = state_journal.load(channel)
+        for number, saved in state.slots.items():
+            slot = slots.get(number)
+            if slot is None:
+                continue  # SLOT_COUNT was lowered since
+            if saved.get('user'):
+                slots.set_user(number, saved['user'])
+            if saved.get('voice'):
+                slot.voice = saved['voice']
+            if saved.get('tts') is not None:
+                slot.tts_enabled = saved['tts']
+            # Clients connecting from now on are shown the restored users instead of empty slots
+            publish_slot(slot.number, channel, current_user=slot.current_user, tts=slot.tts_enabled, voice=slot.voice)
+            restored += 1
+        for number, pool in state.pools.items():
+            slot = slots.get(number)
+            if slot is None:
+                continue
+            # The index needs its chatters touched oldest first
+            for name, seen in sorted(pool.items(), key=lambda item: item[1]):
+                slot.user_pool.touch(name, seen + offset)
+            slot.user_pool.expire()
+            chatters += len(slot.user_pool)
+    print(f"[green]Restored {restored} slot(s) and {chatters} active chatter(s) "
+          f"in {(time.perf_counter() - started) * 1000:.1f} ms[/green]")
+
+
 # --- Web App Routes and Event Handlers ---
 
 @app.route("/")
 def home():
-    """Render the main page"""
-    return render_template('index.html')
+    """Render the main page, or the list of channels in multi-channel mode"""
+    if MULTI_CHANNEL:
+        return render_template('channels.html', channels=CHANNELS, user_numbers=SLOT_NUMBERS)
+    return render_template('index.html', user_numbers=SLOT_NUMBERS, voices=tts_manager.get_voices(), channel=None)
+
+@app.route("/channel/<channel>")
+def channel_home(channel):
+    """Render the dashboard of one channel"""
+    channel = channel.lower()
+    if channel not in CHANNELS:
+        abort(404)
+    return render_template('index.html', user_numbers=SLOT_NUMBERS, voices=tts_manager.get_voices(),
+                           channel=room_channel(channel))
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """Expose pipeline metrics in the Prometheus text format"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route("/ready")
+def ready():
+    """Report which subsystems are up, 503 until the required ones are"""
+    status = startup.get_status()
+    if channel_supervisor is not None:
+        status['workers'] = channel_supervisor.get_status()
+        status['ready'] = status['ready'] and all(worker['ready'] for worker in status['workers'].values())
+    return jsonify(status), 200 if status['ready'] else 503
 
 @app.route("/obs")
-def obs_overlay():
+def obs_overlay(channel=None):
     """Render a transparent overlay for OBS with a single user"""
     user_number = request.args.get('user', '1')
     
     # Try to convert to int to check validity
     try:
         user_num = int(user_number)
-        # For now, validate against 1, 2, 3 (can be expanded if dynamic user system is implemented)
-        if user_num not in [1, 2, 3]:
+        if not 1 <= user_num <= SLOT_COUNT:
             user_number = '1'  # Default to user 1 if invalid
     except ValueError:
         user_number = '1'  # Default to user 1 if not a number
         
-    return render_template('obs.html', user_number=user_number)
+    return render_template('obs.html', user_number=user_number, channel=room_channel(channel))
+
+@app.route("/channel/<channel>/obs")
+def channel_obs_overlay(channel):
+    """Render the OBS overlay of one of a channel's users"""
+    channel = channel.lower()
+    if channel not in CHANNELS:
+        abort(404)
+    return obs_overlay(channel)
+
+def client_channel(auth):
+    """Return the channel a connecting client shows"""
+    channel = str((auth or {}).get('channel') or '').lower()
+    return channel if channel in CHANNELS else CHANNELS[0]
+
+def client_room(auth):
+    """Return the room a connecting client joins and the slots it shows"""
+    channel = room_channel(client_channel(auth))
+    # Overlays pass the slot they show, everything else is a dashboard
+    user_number = str((auth or {}).get('user_number', ''))
+    if user_number in SLOT_NUMBERS:
+        return slot_room(user_number, channel), [user_number]
+    return dashboard_room(channel), SLOT_NUMBERS
+
+def client_snapshot(auth, user_numbers):
+    """Current state of the slots a newly connected client shows"""
+    return slot_views.snapshot(room_channel(client_channel(auth)), user_numbers)
 
 @socketio.event
 def connect(auth=None):
     """Handle client connection event"""
-    for i in range(1, 4):
-        socketio.emit('message_send', {
-            'message': "This is a temporary message",
-            'current_user': "Temp User",
-            'user_number': str(i)
-        })
+    room, user_numbers = client_room(auth)
+    join_room(room)
+    client_channels[request.sid] = client_channel(auth)
+    
+    # Only the connecting client gets the snapshot, everyone else already has this state
+    emit(SLOT_SNAPSHOT, client_snapshot(auth, user_numbers))
+
+@socketio.event
+def disconnect(*args):
+    """Forget which channel a client was showing"""
+    client_channels.pop(request.sid, None)
 
 @socketio.on("tts")
 def toggle_tts(value):
+    """Toggle TTS for a specific user slot"""
+    run_command('tts', value)
+
+@socketio.on("pickrandom")
+def pick_random(value):
+    """Pick a random user for the specified slot"""
+    run_command('pickrandom', value)
+
+@socketio.on("choose")
+def choose_user(value):
+    """Choose a specific user for the specified slot"""
+    run_command('choose', value)
+
+@socketio.on("voice_change")
+def change_voice(value):
+    """Change the voice for a specific user slot"""
+    run_command('voice_change', value)
+
+def run_command(name, value):
+    """Apply a dashboard command, or hand it to the worker process that owns the client's channel"""
+    if not MULTI_CHANNEL:
+        COMMANDS[name](value, CHANNELS[0])
+        return
+    channel = client_channels.get(request.sid, CHANNELS[0])
+    if channel_supervisor is None:
+        print(f"[red]Channel workers not started, can't handle '{name}' for #{channel}[/red]")
+    elif not channel_supervisor.send(channel, name, value):
+        print(f"[red]No channel worker serves #{channel}[/red]")
+
+
+# --- Dashboard Commands ---
+# Run in the process that runs the channel's bot, each gets the command's value and the channel
+
+def apply_tts(value, channel):
     """Toggle TTS for a specific user slot"""
     global twitchbot
     
@@ -383,17 +613,15 @@ def toggle_tts(value):
     print(f"[cyan]TTS: Received the value {str(value['checked'])} for user {value['user_number']}[/cyan]")
     
     try:
-        if value['user_number'] == "1":
-            twitchbot.tts_enabled_1 = value['checked']
-        elif value['user_number'] == "2":
-            twitchbot.tts_enabled_2 = value['checked']
-        elif value['user_number'] == "3":
-            twitchbot.tts_enabled_3 = value['checked']
+        slot = get_slot(channel, value['user_number'])
+        if slot is not None:
+            slot.tts_enabled = value['checked']
+            journal_slot(channel, slot)
+            publish_slot(slot.number, channel, tts=slot.tts_enabled)
     except Exception as e:
         print(f"[red]Error toggling TTS: {e}[/red]")
 
-@socketio.on("pickrandom")
-def pick_random(value):
+def apply_pick_random(value, channel):
     """Pick a random user for the specified slot"""
     global twitchbot
     
@@ -402,13 +630,16 @@ def pick_random(value):
         return
     
     try:    
-        twitchbot.random_user(value['user_number'])
+        slot = get_slot(channel, value['user_number'])
+        previous_user = slot.current_user if slot else None
+        twitchbot.random_user(value['user_number'], channel)
         print(f"[magenta]Getting new random user for user {value['user_number']}[/magenta]")
+        if slot is not None and slot.current_user != previous_user:
+            preempt_slot(slot.number, channel)
     except Exception as e:
         print(f"[red]Error picking random user: {e}[/red]")
 
-@socketio.on("choose")
-def choose_user(value):
+def apply_choose(value, channel):
     """Choose a specific user for the specified slot"""
     global twitchbot
     
@@ -420,20 +651,15 @@ def choose_user(value):
     chosen_user = value['chosen_user'].lower()
     
     try:
-        if user_number == "1":
-            twitchbot.current_user_1 = chosen_user
-            emit_user_update(user_number, chosen_user)
-        elif user_number == "2":
-            twitchbot.current_user_2 = chosen_user
-            emit_user_update(user_number, chosen_user)
-        elif user_number == "3":
-            twitchbot.current_user_3 = chosen_user
-            emit_user_update(user_number, chosen_user)
+        slots = twitchbot.slots_for(channel)
+        if slots is not None and user_number in slots:
+            journal_slot(channel, slots.set_user(user_number, chosen_user))
+            emit_user_update(user_number, chosen_user, channel)
+            preempt_slot(user_number, channel)
     except Exception as e:
         print(f"[red]Error choosing user: {e}[/red]")
 
-@socketio.on("voice_change")
-def change_voice(value):
+def apply_voice_change(value, channel):
     """Change the voice for a specific user slot"""
     global twitchbot
     
@@ -447,108 +673,317 @@ def change_voice(value):
     print(f"[green]Voice: Changing voice for user {user_number} to {voice_id}[/green]")
     
     try:
-        if user_number == "1":
-            twitchbot.voice_1 = voice_id
-        elif user_number == "2":
-            twitchbot.voice_2 = voice_id
-        elif user_number == "3":
-            twitchbot.voice_3 = voice_id
+        slot = get_slot(channel, user_number)
+        if slot is not None:
+            slot.voice = voice_id
+            journal_slot(channel, slot)
+            publish_slot(slot.number, channel, voice=slot.voice)
     except Exception as e:
         print(f"[red]Error changing voice: {e}[/red]")
 
+COMMANDS = {
+    'tts': apply_tts,
+    'pickrandom': apply_pick_random,
+    'choose': apply_choose,
+    'voice_change': apply_voice_change,
+}
+
 
 # --- Helper Functions ---
 
-def control_obs_audio_filter(user_number, enable):
-    """Enable/disable OBS audio move filter for a specific user"""
-    global obs, requests
+def control_obs_audio_filter(user_number, enable, channel=None):
+    """Enable/disable OBS audio move filter for a specific user without blocking"""
+    channel = channel or CHANNELS[0]
+    obs = obs_managers.get(channel)
 
-    if not obs or os.getenv('USE_OBS', '0') != '1':
-        print(f"[yellow]OBS not available or disabled. OBS: {obs}, USE_OBS: {os.getenv('USE_OBS', '0')}[/yellow]")
+    if not obs or not obs.connected:
+        print(f"[yellow]OBS not available or disabled for #{channel}. OBS: {obs}, USE_OBS: {channel_env(channel, 'USE_OBS', '0')}[/yellow]")
         return
     
     try:
         # Get the main audio source (typically the same for all users)
-        source_name = os.getenv('OBS_SOURCE', 'Line In')
+        source_name = channel_env(channel, 'OBS_SOURCE', 'Line In')
         
         # Get filter names for each user
-        if user_number == "1":
-            filter_name = os.getenv('OBS_AUDIO_MOVE_FILTER_1', 'Audio Move Filter 1')
-        elif user_number == "2":
-            filter_name = os.getenv('OBS_AUDIO_MOVE_FILTER_2', 'Audio Move Filter 2')
-        elif user_number == "3":
-            filter_name = os.getenv('OBS_AUDIO_MOVE_FILTER_3', 'Audio Move Filter 3')
-        else:
+        if user_number not in SLOT_NUMBERS:
             print(f"[red]Invalid user number: {user_number}[/red]")
             return
+        filter_name = channel_env(channel, f'OBS_AUDIO_MOVE_FILTER_{user_number}', f'Audio Move Filter {user_number}')
         
         print(f"[cyan]OBS Control: User {user_number}, Source: {source_name}, Filter: {filter_name}, Enable: {enable}[/cyan]")
         
-        # Enable/disable the filter for the current user
-        if enable:
-            obs.call(requests.SetSourceFilterEnabled(
-                sourceName=source_name,
-                filterName=filter_name,
-                filterEnabled=True
-            ))
-            print(f"[green]Enabled OBS audio filter '{filter_name}' for user {user_number}[/green]")
-        else:
-            obs.call(requests.SetSourceFilterEnabled(
-                sourceName=source_name,
-                filterName=filter_name,
-                filterEnabled=False
-            ))
-            print(f"[yellow]Disabled OBS audio filter '{filter_name}' for user {user_number}[/yellow]")
+        # Queue the filter state, the OBS dispatcher coalesces and sends it
+        obs.set_filter_enabled(source_name, filter_name, enable)
             
     except Exception as e:
         print(f"[red]Error controlling OBS audio filter for user {user_number}: {e}[/red]")
 
-def emit_user_update(user_number, username):
+def publish_slot(user_number, channel=None, **fields):
+    """Update what a slot shows and send the new state to the dashboard and that slot's overlays"""
+    channel = room_channel(channel)
+    socket_emitter.emit_to_slot(SLOT_UPDATE, slot_views.update(channel, user_number, **fields), user_number, channel)
+
+def relay_worker_event(event, data, room):
+    """Emit an event from a channel worker, keeping the front end's copy of the slot views current"""
+    if event == SLOT_UPDATE:
+        slot_views.apply(data)
+    socket_emitter.emit(event, data, room)
+
+def emit_user_update(user_number, username, channel=None):
     """Emit a message that a user has been selected"""
     # This event is received by both the main page and the OBS overlay
-    socketio.emit('message_send', {
-        'message': f"{username} was picked!",
-        'current_user': f"{username}",
-        'user_number': user_number
-    })
+    publish_slot(user_number, channel, current_user=username, message=f"{username} was picked!")
 
-def process_tts(message, user_number):
-    """Process text-to-speech for a message"""
-    global twitchbot
-    
-    # Get the appropriate voice for this user
+def preempt_slot(user_number, channel=None):
+    """Silence a re-rolled slot so the previous chatter's messages don't play over the new one"""
+    if os.getenv('TTS_PREEMPT_ON_REROLL', '1') != '1':
+        return
+    key = slot_key(channel or CHANNELS[0], user_number)
+    cleared = tts_queue.clear(key)
+    audio_manager.stop_slot(key)
+    print(f"[magenta]Cleared {cleared} queued message(s) and stopped playback for user {key}[/magenta]")
+
+def get_slot(channel, user_number):
+    """The bot's slot for a user number in a channel, or None"""
+    slots = twitchbot.slots_for(channel) if twitchbot else None
+    return slots.get(user_number) if slots is not None else None
+
+def get_slot_voice(key):
+    """Get the appropriate voice for a user slot"""
     voice_id = 'Joanna'  # Default fallback
-    if twitchbot:
-        if user_number == "1":
-            voice_id = twitchbot.voice_1
-        elif user_number == "2":
-            voice_id = twitchbot.voice_2
-        elif user_number == "3":
-            voice_id = twitchbot.voice_3
-    
-    output_path = tts_manager.text_to_speech(message, voice_id=voice_id)
-    audio_manager.load_audio(output_path)
-    audio_manager.play_audio(output_path)
-    
-    # Emit the audio play event to the client for UI feedback
-    socketio.emit('play_audio', {
-        'user_number': user_number,
-        'message': message
-    })
+    slot = get_slot(*split_slot_key(key))
+    if slot is not None:
+        voice_id = slot.voice
+    return voice_id
+
+def queue_playback(message, key, handle, first=True, started_at=None, release=None, expires_at=None):
+    """Queue a loaded clip on the slot's channel with its start and completion callbacks.
+
+    Later chunks of the same message (first=False) play gaplessly after the
+    previous one and don't announce the message again. release() is called
+    once the clip starts playing or is dropped without playing, and a first
+    clip still waiting for the slot at expires_at is dropped.
+    """
+    channel, user_number = split_slot_key(key)
+    # The slot's sound is already in the clip when it has voice effects
+    use_obs = (channel, user_number) not in SLOT_EFFECTS
+
+    def on_start():
+        # Enable OBS audio filter for this user while their message is spoken
+        if use_obs:
+            control_obs_audio_filter(user_number, True, channel)
+        if release is not None:
+            release()
+
+        # Emit the audio play event to the client for UI feedback
+        if first:
+            if started_at is not None:
+                metrics.playback_start_seconds.observe(time.perf_counter() - started_at, user_number=key)
+            socket_emitter.emit_to_slot('play_audio', {
+                'user_number': user_number,
+                'message': message
+            }, user_number, room_channel(channel))
+
+    def on_complete():
+        # Disable the OBS audio filter after TTS finishes, an enable from the
+        # next chunk cancels it before it reaches OBS
+        if use_obs:
+            control_obs_audio_filter(user_number, False, channel)
+
+    audio_manager.play_on_slot(handle, key, on_start=on_start, on_complete=on_complete, gapless=not first,
+                               on_drop=release, expires_at=expires_at if first else None)
+
+def load_clip(audio, key):
+    """Load a synthesized clip for a slot, rendered through the slot's voice effects if it has any"""
+    chain = SLOT_EFFECTS.get(split_slot_key(key))
+    if chain is None:
+        return audio_manager.load_audio(audio, pcm_rate=PCM_RATE)
+    # Rendered clips are cached next to the synthesized ones, keyed by the source audio and the effects
+    cache_key = audio_cache.make_key(hashlib.sha256(audio).hexdigest(), chain.signature, 'wav', 'effects')
+    rendered = audio_cache.get(cache_key)
+    if rendered is None:
+        rendered = chain.render(*audio_manager.decode_audio(audio, pcm_rate=PCM_RATE))
+        audio_cache.put(cache_key, rendered)
+    return audio_manager.load_audio(rendered)
+
+def process_tts(message, key):
+    """Process text-to-speech for a message"""
+    started_at = time.perf_counter()
+    voice_id = get_slot_voice(key)
+    epoch = tts_queue.epoch(key)
     
-    # get length of audio file to determine how long to play it
-    audio_length = audio_manager.get_audio_length(output_path)
+    # The job stays open until its first clip starts playing, so the slot's
+    # later messages wait in its queue instead of piling up in the mixer.
+    # TTS_MAX_AGE still applies while its audio waits for the slot
+    release = tts_queue.hold(key)
+    expires_at = tts_queue.deadline(key)
+    queued = False
 
-    # Clean up after playing
-    audio_manager.unload_audio(output_path)
+    # Each chunk is queued as soon as it arrives so playback starts early
+    chunks = tts_manager.iter_speech_chunks(message, voice_id=voice_id)
+    try:
+        for index, audio in enumerate(chunks):
+            if tts_queue.epoch(key) != epoch:
+                return  # the slot was re-rolled while this message was synthesized
+            if not audio:
+                print(f"[red]No audio returned for user {key}[/red]")
+                return
+            queue_playback(message, key, load_clip(audio, key), first=index == 0, started_at=started_at,
+                           release=None if queued else release, expires_at=expires_at)
+            queued = True
+    finally:
+        chunks.close()
+        if not queued:
+            release()
 
-    time.sleep(audio_length + .3)  # Wait for the audio to finish playing
+async def process_tts_async(message, key):
+    """Process text-to-speech for a message on the shared event loop"""
+    loop = asyncio.get_running_loop()
+    started_at = time.perf_counter()
+    voice_id = get_slot_voice(key)
+    epoch = tts_queue.epoch(key)
     
-    # Disable the OBS audio filter after TTS finishes
-    control_obs_audio_filter(user_number, False)
+    # Open until the first clip starts playing, like process_tts
+    release = tts_queue.hold(key)
+    expires_at = tts_queue.deadline(key)
+
+    # Polly and decoding block, so they run on the loop's fixed-size executor
+    chunks = tts_manager.iter_speech_chunks(message, voice_id=voice_id)
+    done = object()
+    index = 0
+    try:
+        while True:
+            audio = await loop.run_in_executor(None, next, chunks, done)
+            if audio is done or tts_queue.epoch(key) != epoch:
+                return
+            if not audio:
+                print(f"[red]No audio returned for user {key}[/red]")
+                return
+            handle = await loop.run_in_executor(None, load_clip, audio, key)
+            queue_playback(message, key, handle, first=index == 0, started_at=started_at,
+                           release=release if index == 0 else None, expires_at=expires_at)
+            index += 1
+    finally:
+        chunks.close()
+        if not index:
+            release()
+
+# Bounded worker pool with one ordered queue per user slot, the asyncio
+# runtime swaps in an AsyncTTSQueueManager before any message arrives
+tts_queue = TTSQueueManager(
+    process_tts,
+    workers=int(os.getenv('TTS_WORKERS', 3)),
+    max_depth=int(os.getenv('TTS_QUEUE_DEPTH', 5)),
+    drop_policy=os.getenv('TTS_DROP_POLICY', 'oldest'),
+    coalesce_chars=int(os.getenv('TTS_COALESCE_CHARS', 500)),
+    max_age=float(os.getenv('TTS_MAX_AGE', 30))
+)
+
+# Gauges are read when /metrics is scraped
+metrics.tts_jobs_in_flight.set_function(
+    lambda: sum(stats['active'] for stats in tts_queue.get_stats().values()))
+metrics.tts_queue_length.set_function(
+    lambda: {(user_number,): stats['queue_length'] for user_number, stats in tts_queue.get_stats().items()})
+metrics.chatter_pool_size.set_function(
+    lambda: {(slot_key(channel, slot.number),): len(slot.user_pool)
+             for channel, slots in twitchbot.channel_slots.items() for slot in slots} if twitchbot else {})
+metrics.activity_registry_size.set_function(lambda: len(activity_registry))
+metrics.audio_loaded_bytes.set_function(lambda: audio_manager.loaded_bytes)
+metrics.obs_pending_commands.set_function(
+    lambda: sum(obs.get_stats()['pending'] for obs in obs_managers.values() if obs))
+metrics.subsystem_ready.set_function(
+    lambda: {(name,): int(info['state'] == 'ready') for name, info in startup.get_status()['subsystems'].items()})
+
+def start_subsystems(include_bot=True):
+    """Bring up the audio device, Polly, OBS and the Twitch bot concurrently without blocking.
+
+    The multi-channel front end starts the channel worker processes instead
+    of a bot, and each worker brings up its own audio, OBS and bot.
+    """
+    if os.getenv('POLLY_WARM_UP', '1') == '1':
+        # Pay for DNS, TLS and the voice list before the first chat message does
+        connections = int(os.getenv('POLLY_WARM_CONNECTIONS', 2))
+        startup.run('polly', lambda: tts_manager.warm_up(connections=connections),
+                    timeout=STARTUP_TIMEOUT, required=False)
+    else:
+        startup.skip('polly', 'POLLY_WARM_UP is off')
+    if MULTI_CHANNEL and include_bot:
+        startup.begin('twitch', timeout=STARTUP_TIMEOUT)
+        threading.Thread(target=start_channel_workers, name="startup-twitch", daemon=True).start()
+        return
+    startup.run('audio', audio_manager.start, timeout=STARTUP_TIMEOUT)
+    for channel, obs in obs_managers.items():
+        name = f'obs/{channel}' if MULTI_CHANNEL else 'obs'
+        if obs:
+            startup.run(name, obs.connect, timeout=STARTUP_TIMEOUT, required=False)
+        else:
+            startup.skip(name, 'USE_OBS is off')
+    if include_bot:
+        startup.begin('twitch', timeout=STARTUP_TIMEOUT)
+        threading.Thread(target=start_twitch_bot, name="startup-twitch", daemon=True).start()
+
+def start_channel_workers():
+    """Refresh the Twitch token once and start the worker processes of multi-channel mode"""
+    global channel_supervisor
+
+    # Workers inherit the refreshed token, so they don't race each other refreshing it
+    print("[bold blue]Refreshing Twitch credentials...[/bold blue]")
+    if not refresh_twitch_token():
+        print("[bold red]Failed to refresh Twitch token. Cannot start channel workers.[/bold red]")
+        startup.finish('twitch', False, 'token refresh failed')
+        return None
+    with open(BOT_FLAG_FILE, 'w') as f:
+        f.write('initialized')
+
+    def on_worker_status(name, status):
+        if status['ready'] and not startup.is_ready(name):
+            startup.finish(name)
+
+    supervisor = channel_workers.ChannelSupervisor(run_channel_worker, CHANNELS, CHANNEL_WORKERS,
+                                                   emit=relay_worker_event, on_status=on_worker_status)
+    for index in range(len(supervisor.shards)):
+        # Spawning a worker imports the whole app before its own subsystems start
+        startup.begin(supervisor.worker_name(index), timeout=STARTUP_TIMEOUT * 2)
+    supervisor.start()
+    channel_supervisor = supervisor
+    startup.finish('twitch')
+    return supervisor
+
+def run_channel_worker(index, channels, outbox, commands):
+    """Entry point of a channel worker process, runs the bot and TTS pipeline for a shard of the channels"""
+    global CHANNELS, socket_emitter, obs_managers, state_journal, audio_cache
+
+    CHANNELS = channels
+    state_journal = create_state_journal()
+    audio_cache = tts_manager.cache = create_audio_cache(
+        index, len(channel_workers.shard_channels(TWITCH_CHANNELS, CHANNEL_WORKERS)))
+    # Events go to the front end, which emits them into the channel's rooms
+    socket_emitter = channel_workers.QueueEmitter(outbox)
+    obs_managers = {channel: create_obs_manager(channel) for channel in channels}
+    channel_workers.serve_commands(commands, COMMANDS, on_stop=stop_channel_worker)
+    channel_workers.watch_parent(stop_channel_worker)
+    channel_workers.report_status(outbox, index, startup.get_status)
+
+    start_subsystems(include_bot=False)
+    # The front end refreshed the token before starting this process
+    startup.begin('twitch', timeout=STARTUP_TIMEOUT)
+    initialize_and_run_bot()
+
+def stop_channel_worker():
+    """Shut a channel worker down when the front end asks it to or has died"""
+    print("[bold red]Channel worker shutting down...[/bold red]")
+    if twitchbot is not None:
+        twitchbot._shutdown = True
+        twitchbot.loop.call_soon_threadsafe(twitchbot.loop.stop)
+    tts_queue.shutdown()
+    if state_journal is not None:
+        state_journal.close()
+    audio_manager.close()
+    # The bot's loop runs on the main thread and may be stuck in a reconnect, so don't wait for it
+    os._exit(0)
 
 def signal_handler(signum, frame):
-    """Handle Ctrl+C gracefully"""
+    """Handle Ctrl+C and SIGTERM gracefully"""
     print("\n[bold red]Shutting down...[/bold red]")
     
     # Clean up the bot flag file
@@ -558,6 +993,11 @@ def signal_handler(signum, frame):
         except:
             pass
     
+    if channel_supervisor is not None:
+        channel_supervisor.stop()
+    if state_journal is not None:
+        state_journal.close()
+    
     if twitchbot:
         twitchbot._shutdown = True
         try:
@@ -569,12 +1009,13 @@ def signal_handler(signum, frame):
     sys.exit(0)
 
 def start_twitch_bot():
-    """Start the Twitch bot on a separate thread"""
+    """Start the Twitch bot on a separate thread and wait until it has joined the channel"""
     global twitchbot
 
     if os.path.exists(BOT_FLAG_FILE):
         print("[yellow]Bot initialization flag exists, another process may have already initialized the bot[/yellow]")
-        exit(1)
+        startup.finish('twitch', False, 'another process has already initialized the bot')
+        return None
         
     if twitchbot is None:  # Only start if not already running
         try:
@@ -582,6 +1023,7 @@ def start_twitch_bot():
             print("[bold blue]Refreshing Twitch credentials...[/bold blue]")
             if not refresh_twitch_token():
                 print("[bold red]Failed to refresh Twitch token. Cannot start bot.[/bold red]")
+                startup.finish('twitch', False, 'token refresh failed')
                 return None
             
             # Create flag file to indicate we're initializing the bot
@@ -593,11 +1035,15 @@ def start_twitch_bot():
             bot_thread = threading.Thread(target=initialize_and_run_bot, daemon=True)
             bot_thread.start()
             
-            # Give it a moment to initialize
-            time.sleep(2)
-            print("[bold green]Twitch bot started and running on a separate thread.[/bold green]")
+            # event_ready sets bot_ready once the bot has joined the channel
+            started = time.monotonic()
+            if bot_ready.wait(STARTUP_TIMEOUT):
+                print(f"[bold green]Twitch bot ready after {time.monotonic() - started:.2f}s on a separate thread.[/bold green]")
+            else:
+                print(f"[yellow]Twitch bot not ready after {STARTUP_TIMEOUT:g}s, still connecting in the background[/yellow]")
         except Exception as e:
             print(f"[bold red]Error starting TwitchBot: {e}[/bold red]")
+            startup.finish('twitch', False, str(e))
             twitchbot = None
             # Remove flag file if initialization failed
             if os.path.exists(BOT_FLAG_FILE):
@@ -616,12 +1062,14 @@ def initialize_and_run_bot():
         
         # Initialize the bot
         twitchbot = TwitchBot()
+        restore_state(twitchbot)
         print("[bold green]TwitchBot initialized successfully[/bold green]")
         
         # Run the bot
         twitchbot.run()
     except Exception as e:
         print(f"[bold red]Error in initialize_and_run_bot: {e}[/bold red]")
+        startup.finish('twitch', False, str(e))
         twitchbot = None
 
 
@@ -629,16 +1077,25 @@ if __name__ == '__main__':
     # Ensure we're in the correct directory
     os.chdir(os.path.dirname(os.path.abspath(__file__)))
     
-    # Set up signal handler for graceful shutdown
-    signal.signal(signal.SIGINT, signal_handler)
-    
     # Remove any leftover flag file from previous runs
     if os.path.exists(BOT_FLAG_FILE):
         os.remove(BOT_FLAG_FILE)
     
-    # Start the Twitch bot before running the web app
-    print("[bold blue]Starting Twitch bot...[/bold blue]")
-    start_twitch_bot()
+    if os.getenv('RUNTIME_MODE', 'threading') == 'asyncio' and MULTI_CHANNEL:
+        print("[yellow]RUNTIME_MODE=asyncio runs a single channel, using the threading front end for TWITCH_CHANNELS[/yellow]")
+    elif os.getenv('RUNTIME_MODE', 'threading') == 'asyncio':
+        # Bot, web server and TTS all share one event loop
+        import async_runtime
+        async_runtime.run(sys.modules[__name__], port=8080)
+        sys.exit(0)
+    
+    # Set up signal handlers for graceful shutdown, SIGTERM is what docker stop and kill send
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+    
+    # Audio, Polly, OBS and the Twitch bot start in the background, /ready reports their progress
+    print("[bold blue]Starting subsystems...[/bold blue]")
+    start_subsystems()
     
     # Start the Flask app with Socket.IO
     print("[bold blue]Starting web server. Press Ctrl+C to stop.[/bold blue]")
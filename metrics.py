@@ -0,0 +1,223 @@
+"""
+Prometheus-style metrics for the chat-to-speech pipeline.
+
+A small in-process registry of counters, histograms and gauges that
+renders the Prometheus text exposition format for the /metrics route.
+Instruments are module level so every stage can record into them without
+passing a registry around.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds, from a cache hit to a slow Polly call
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metric '{self.name}' expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self._samples())
+        return '\n'.join(lines)
+
+    def _samples(self):
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """Monotonically increasing value"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        super().__init__(name, documentation, labelnames, registry)
+        self._values = {} if self.labelnames else {(): 0}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+                for key, value in sorted(values.items())]
+
+
+class Gauge(Metric):
+    """Value that can go up and down, or is read from a callback at scrape time"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        super().__init__(name, documentation, labelnames, registry)
+        self._values = {} if self.labelnames else {(): 0}
+        self._function = None
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function):
+        """Read the gauge from function() when scraped.
+
+        Without labels the function returns a number, with labels it
+        returns a dict mapping label value tuples to numbers.
+        """
+        self._function = function
+
+    def _samples(self):
+        if self._function is not None:
+            try:
+                values = self._function()
+            except Exception:
+                return []  # a failing source shouldn't break the whole scrape
+            if not self.labelnames:
+                values = {(): values}
+            values = {tuple(str(part) for part in key): value for key, value in values.items()}
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+                for key, value in sorted(values.items())]
+
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS, registry=None):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._series = {}  # label values -> [bucket counts, sum]
+        if not self.labelnames:
+            self._series[()] = [[0] * len(self.buckets), 0.0]
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self):
+        with self._lock:
+            series = {key: (list(counts), total) for key, (counts, total) in self._series.items()}
+        lines = []
+        for key, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [('le', _format_value(bound))])
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric '{metric.name}' is already registered")
+            self._metrics[metric.name] = metric
+
+    def render(self):
+        """Return every metric in the Prometheus text format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def render():
+    return REGISTRY.render()
+
+
+# --- Pipeline instruments ---
+
+chat_messages = Counter('chat_messages_total', 'Chat messages received from Twitch IRC')
+chat_dispatch_seconds = Histogram('chat_dispatch_seconds',
+                                  'Time from Twitch sending a chat message to process_message dispatching it')
+tts_submitted = Counter('tts_messages_submitted_total', 'Messages submitted to the TTS queue', ['user_number'])
+tts_queue_wait_seconds = Histogram('tts_queue_wait_seconds', 'Time a TTS job waited in its slot queue')
+format_seconds = Histogram('tts_format_seconds', 'Time spent converting chat text into SSML')
+polly_seconds = Histogram('polly_synthesize_seconds', 'Polly synthesize_speech latency including the download',
+                          ['voice_id'])
+polly_requests = Counter('polly_requests_total', 'Polly synthesize_speech calls', ['result'])
+polly_bytes = Counter('polly_audio_bytes_total', 'Audio bytes received from Polly')
+tts_backend_seconds = Histogram('tts_backend_seconds', 'Synthesis latency of each TTS backend', ['backend'])
+tts_backend_requests = Counter('tts_backend_requests_total', 'Synthesis calls per TTS backend', ['backend', 'result'])
+tts_cache_lookups = Counter('tts_cache_lookups_total', 'Audio cache lookups', ['result'])
+audio_load_seconds = Histogram('audio_load_seconds', 'Time to decode and load a clip in AudioManager.load_audio')
+playback_start_seconds = Histogram('tts_playback_start_seconds',
+                                   'Time from a TTS job starting to its first audio playing', ['user_number'])
+obs_call_seconds = Histogram('obs_call_seconds', 'OBS websocket request latency', ['result'])
+socketio_emits = Counter('socketio_emits_total', 'Socket.IO events emitted', ['event'])
+socketio_frames = Counter('socketio_frames_total', 'Socket.IO frames sent after batching')
+moderation_seconds = Histogram('moderation_check_seconds', 'Time to scan a chat message for blocked terms',
+                               buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01))
+moderation_matches = Counter('moderation_matches_total', 'Chat messages with blocked terms, by the action taken', ['action'])
+
+tts_jobs_in_flight = Gauge('tts_jobs_in_flight', 'TTS jobs currently being synthesized by a queue worker')
+tts_queue_length = Gauge('tts_queue_length', 'Messages waiting in each slot queue', ['user_number'])
+chatter_pool_size = Gauge('chatter_pool_size', 'Active chatters registered for each slot', ['user_number'])
+activity_registry_size = Gauge('activity_registry_users', 'Chatters tracked by the activity registry')
+audio_loaded_bytes = Gauge('audio_loaded_bytes', 'Decoded audio currently held by AudioManager')
+obs_pending_commands = Gauge('obs_pending_commands', 'OBS filter changes waiting to be sent')
+subsystem_ready = Gauge('subsystem_ready', 'Whether each startup subsystem is up (1) or not (0)', ['subsystem'])
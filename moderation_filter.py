@@ -0,0 +1,297 @@
+"""
+Blocklist filter applied to chat before it is shown and spoken.
+
+All terms are compiled into one Aho-Corasick automaton, so a message is
+scanned once no matter how many terms there are. Messages and terms are
+folded the same way before matching: Unicode compatibility forms and
+accents are stripped, common Cyrillic/Greek look-alikes and leetspeak
+digits are mapped to Latin letters, and punctuation between single
+letters is dropped, so "B@D", "b.a.d" and "ｂａｄ" all match "bad". Other
+punctuation between letters is a word break, "good/bad" is two words.
+Matches are mapped back to the original text so only the offending words
+change.
+
+Terms file format: one term per line, '#' starts a comment. A term
+matches whole words only unless it starts or ends with '*', which lets it
+match inside longer words on that side ("*bad*" matches "notbadatall").
+The file is reloaded in the background when it changes.
+"""
+
+import os
+import threading
+import time
+import unicodedata
+
+from rich import print
+
+import metrics
+
+ACTIONS = ('mask', 'skip', 'replace')
+
+LEETSPEAK = {'0': 'o', '1': 'i', '3': 'e', '4': 'a', '5': 's', '7': 't', '8': 'b', '9': 'g', '@': 'a', '$': 's'}
+
+# Letters that render like Latin ones but aren't decomposed by NFKD
+HOMOGLYPHS = {
+    'а': 'a', 'в': 'b', 'е': 'e', 'ё': 'e', 'к': 'k', 'м': 'm', 'н': 'h', 'о': 'o', 'р': 'p', 'с': 'c',
+    'т': 't', 'у': 'y', 'х': 'x', 'і': 'i', 'ј': 'j', 'ѕ': 's', 'ԁ': 'd', 'ӏ': 'l',
+    'α': 'a', 'β': 'b', 'ε': 'e', 'η': 'n', 'ι': 'i', 'κ': 'k', 'ν': 'v', 'ο': 'o', 'ρ': 'p', 'τ': 't',
+    'υ': 'u', 'χ': 'x',
+}
+
+WORD_START = 1  # flags of a term: must start at a word boundary
+WORD_END = 2  # must end at a word boundary
+
+_folded = {}  # character -> folded form, filled as characters are seen
+
+
+def fold_char(char):
+    """Matching form of one character: '' to drop it, ' ' for a word break, else lowercase letters/digits"""
+    folded = _folded.get(char)
+    if folded is None:
+        if char.isspace():
+            folded = ' '
+        else:
+            folded = ''
+            for part in unicodedata.normalize('NFKD', char):
+                if unicodedata.combining(part):
+                    continue
+                part = part.casefold()
+                part = LEETSPEAK.get(part) or HOMOGLYPHS.get(part, part)
+                if part.isalnum():
+                    folded += part
+        if len(_folded) < 65536:
+            _folded[char] = folded
+    return folded
+
+
+def fold(text):
+    """Folded text and, for each of its characters, the index of the original character it came from"""
+    parts = [fold_char(char) for char in text]
+    last = len(parts) - 1
+    chars = []
+    origins = []
+    run = 0  # letters/digits in the current run, "b.a.d" is three runs of one
+    gap = None  # index of the first punctuation character since the last letter/digit
+    for index, part in enumerate(parts):
+        if not part:
+            if gap is None:
+                gap = index
+            continue
+        if part == ' ':
+            run, gap = 0, None
+            if chars and chars[-1] == ' ':
+                continue  # runs of whitespace are one break
+        elif gap is None:
+            run += 1
+        else:
+            # Punctuation is dropped inside spelled-out words and breaks words anywhere else
+            if run and (run > 1 or index < last and parts[index + 1] not in ('', ' ')):
+                chars.append(' ')
+                origins.append(gap)
+            run, gap = 1, None
+        for char in part:
+            chars.append(char)
+            origins.append(index)
+    return ''.join(chars), origins
+
+
+class TermAutomaton:
+    """Aho-Corasick automaton over folded terms"""
+
+    def __init__(self, terms):
+        self._goto = [{}]  # node -> {char: node}
+        self._fail = [0]
+        self._out = [()]  # node -> ((term length, flags), ...) of every term ending there
+        self.size = 0
+        for term in terms:
+            self._add(term)
+        self._link()
+
+    def _add(self, term):
+        flags = WORD_START | WORD_END
+        if term.startswith('*'):
+            flags &= ~WORD_START
+        if term.endswith('*'):
+            flags &= ~WORD_END
+        folded = ' '.join(fold(term.strip('*').strip())[0].split())
+        if not folded:
+            return
+        node = 0
+        for char in folded:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            node = next_node
+        if (len(folded), flags) not in self._out[node]:
+            self._out[node] += ((len(folded), flags),)
+            self.size += 1
+
+    def _link(self):
+        """Breadth-first failure links, with each node's output including its suffixes' outputs"""
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] += self._out[self._fail[child]]
+
+    def find(self, folded):
+        """(start, end) spans of the folded text that match a term, overlapping ones merged"""
+        goto, fail, out = self._goto, self._fail, self._out
+        spans = []
+        node = 0
+        last = len(folded) - 1
+        for index, char in enumerate(folded):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for length, flags in out[node]:
+                start = index - length + 1
+                if flags & WORD_START and start > 0 and folded[start - 1] != ' ':
+                    continue
+                if flags & WORD_END and index < last and folded[index + 1] != ' ':
+                    continue
+                spans.append((start, index + 1))
+        if len(spans) < 2:
+            return spans
+        # A long term can end after a short one that started later, so sort before merging
+        merged = []
+        for start, end in sorted(spans):
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+
+class Verdict:
+    """Result of filtering one message"""
+
+    __slots__ = ('action', 'matches', 'display', 'spoken')
+
+    def __init__(self, action, matches, display, spoken):
+        self.action = action  # None when nothing matched
+        self.matches = matches  # number of blocked spans
+        self.display = display  # text to show on the dashboard and overlays
+        self.spoken = spoken  # text to speak, None to skip TTS
+
+
+class ModerationFilter:
+    """Filters chat against a hot-reloaded terms file.
+
+    Actions for a message with blocked terms:
+    mask    - show the terms as asterisks and leave them out of the speech
+    skip    - show the terms as asterisks and don't speak the message
+    replace - show and speak `replacement` in place of each term
+    """
+
+    def __init__(self, path=None, terms=(), replacement='beep', reload_interval=2):
+        self.path = path
+        self.replacement = replacement
+        self.reload_interval = reload_interval  # seconds between checks of the file's mtime
+        self._extra_terms = tuple(terms)
+        self._automaton = TermAutomaton(self._extra_terms)
+        self._mtime = None
+        self._next_check = 0
+        self._reload_lock = threading.Lock()
+        self.filtered = 0
+        if path:
+            self.reload()
+
+    def __len__(self):
+        return self._automaton.size
+
+    def reload(self):
+        """Rebuild the automaton from the terms file, returns the number of terms"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            with open(self.path, encoding='utf-8') as f:
+                terms = [line.split('#', 1)[0].strip() for line in f]
+        except FileNotFoundError:
+            mtime, terms = None, []
+        except OSError as e:
+            print(f"[red]Error reading moderation terms from {self.path}: {e}[/red]")
+            return len(self)
+        start = time.perf_counter()
+        automaton = TermAutomaton(self._extra_terms + tuple(term for term in terms if term))
+        # Swapped in whole, messages being checked keep using the automaton they started with
+        self._automaton = automaton
+        self._mtime = mtime
+        if mtime is not None:
+            print(f"[cyan]Moderation: loaded {automaton.size} term(s) from {self.path} "
+                  f"in {(time.perf_counter() - start) * 1000:.1f} ms[/cyan]")
+        return automaton.size
+
+    def check(self, text, action='mask'):
+        """Apply an action to the blocked terms in text, returns a Verdict"""
+        if action not in ACTIONS:
+            raise ValueError(f"Unknown moderation action '{action}', expected one of {ACTIONS}")
+        self._maybe_reload()
+        automaton = self._automaton
+        if not automaton.size:
+            return Verdict(None, 0, text, text)
+        start = time.perf_counter()
+        folded, origins = fold(text)
+        spans = [(origins[begin], origins[end - 1] + 1) for begin, end in automaton.find(folded)]
+        metrics.moderation_seconds.observe(time.perf_counter() - start)
+        if not spans:
+            return Verdict(None, 0, text, text)
+        self.filtered += 1
+        metrics.moderation_matches.inc(action=action)
+        if action == 'replace':
+            replaced = self._splice(text, spans, lambda term: self.replacement)
+            return Verdict(action, len(spans), replaced, replaced)
+        masked = self._splice(text, spans, lambda term: '*' * len(term))
+        if action == 'skip':
+            return Verdict(action, len(spans), masked, None)
+        spoken = ' '.join(self._splice(text, spans, lambda term: ' ').split())
+        return Verdict(action, len(spans), masked, spoken or None)
+
+    def get_stats(self):
+        return {'terms': len(self), 'filtered': self.filtered}
+
+    @staticmethod
+    def _splice(text, spans, substitute):
+        parts = []
+        position = 0
+        for start, end in spans:
+            parts.append(text[position:start])
+            parts.append(substitute(text[start:end]))
+            position = end
+        parts.append(text[position:])
+        return ''.join(parts)
+
+    def _maybe_reload(self):
+        if not self.path or time.monotonic() < self._next_check:
+            return
+        # Only one thread checks or rebuilds, the others carry on with the current terms
+        if not self._reload_lock.acquire(blocking=False):
+            return
+        self._next_check = time.monotonic() + self.reload_interval
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            self._reload_lock.release()
+            return
+        # A large list takes a while to compile, so check() callers don't wait for it
+        try:
+            threading.Thread(target=self._reload_in_background, name="moderation-reload", daemon=True).start()
+        except RuntimeError:
+            self._reload_lock.release()
+            raise
+
+    def _reload_in_background(self):
+        try:
+            self.reload()
+        finally:
+            self._reload_lock.release()
@@ -0,0 +1,150 @@
+import threading
+import time
+
+from rich import print
+
+import metrics
+
+
+class OBSManager:
+    """Background dispatcher for OBS websocket commands.
+
+    Callers only record the state they want a source filter to be in; a
+    single dispatcher thread owns the websocket connection and sends the
+    commands, so the Twitch event loop never waits on an OBS round trip.
+    Requests for the same filter are coalesced into the latest desired
+    state, and disables are held for `disable_delay` seconds so that an
+    enable arriving right after (the next utterance) cancels both calls.
+    """
+
+    def __init__(self, host='localhost', port=4455, password='', disable_delay=0.5, timeout=10, client_factory=None):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.disable_delay = disable_delay
+        self.timeout = timeout  # seconds to wait for the websocket connection
+        self.client_factory = client_factory or self._create_client
+        self.client = None
+        self._pending = {}  # (source, filter) -> (enabled, due time)
+        self._applied = {}  # (source, filter) -> last state sent to OBS
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread = None
+        self._shutdown = False
+
+        self.requested = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.batches = 0
+
+    def _create_client(self):
+        from obswebsocket import obsws
+        return obsws(host=self.host, port=self.port, password=self.password, timeout=self.timeout)
+
+    def connect(self):
+        """Connect to OBS and start the dispatcher thread, returns True on success"""
+        try:
+            client = self.client_factory()
+            client.connect()
+        except Exception as e:
+            print(f"[red]Error connecting to OBS WebSocket: {e}[/red]")
+            return False
+        self.client = client
+        print("[bold green]Connected to OBS WebSocket successfully[/bold green]")
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._dispatch_loop, name="obs-dispatcher", daemon=True)
+            self._thread.start()
+        return True
+
+    @property
+    def connected(self):
+        return self.client is not None
+
+    def set_filter_enabled(self, source_name, filter_name, enabled):
+        """Queue a filter state change without waiting for OBS"""
+        key = (source_name, filter_name)
+        due = time.monotonic() + (0 if enabled else self.disable_delay)
+        with self._lock:
+            self.requested += 1
+            if key in self._pending:
+                self.coalesced += 1
+            if self._applied.get(key) == enabled:
+                # Nothing to send, this also cancels a toggle still waiting to go out
+                self._pending.pop(key, None)
+                return
+            self._pending[key] = (enabled, due)
+            self._wakeup.notify()
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'requested': self.requested,
+                'sent': self.sent,
+                'coalesced': self.coalesced,
+                'failed': self.failed,
+                'batches': self.batches,
+                'pending': len(self._pending),
+            }
+
+    def disconnect(self):
+        with self._lock:
+            self._shutdown = True
+            self._wakeup.notify_all()
+        if self.client is not None:
+            try:
+                self.client.disconnect()
+            except Exception:
+                pass
+            self.client = None
+
+    def _take_due(self):
+        """Wait for pending commands and remove every one that is due"""
+        with self._lock:
+            while True:
+                if self._shutdown:
+                    return None
+                now = time.monotonic()
+                due = [(key, enabled) for key, (enabled, due_at) in self._pending.items() if due_at <= now]
+                if due:
+                    for key, enabled in due:
+                        del self._pending[key]
+                        # Assume the call succeeds so requests arriving mid-send compare against it
+                        self._applied[key] = enabled
+                    return due
+                if self._pending:
+                    self._wakeup.wait(min(due_at for _, due_at in self._pending.values()) - now)
+                else:
+                    self._wakeup.wait()
+
+    def _dispatch_loop(self):
+        from obswebsocket import requests
+
+        while True:
+            batch = self._take_due()
+            if batch is None:
+                return
+            # obs-websocket-py has no RequestBatch support, so a batch is
+            # sent as consecutive calls on this thread
+            for (source_name, filter_name), enabled in batch:
+                start = time.perf_counter()
+                try:
+                    self.client.call(requests.SetSourceFilterEnabled(
+                        sourceName=source_name,
+                        filterName=filter_name,
+                        filterEnabled=enabled
+                    ))
+                except Exception as e:
+                    metrics.obs_call_seconds.observe(time.perf_counter() - start, result='error')
+                    with self._lock:
+                        self.failed += 1
+                        # The filter state is unknown now, so the next request always goes out
+                        if self._applied.get((source_name, filter_name)) == enabled:
+                            del self._applied[(source_name, filter_name)]
+                    print(f"[red]Error setting OBS filter '{filter_name}' on '{source_name}': {e}[/red]")
+                    continue
+                metrics.obs_call_seconds.observe(time.perf_counter() - start, result='ok')
+                with self._lock:
+                    self.sent += 1
+            with self._lock:
+                self.batches += 1
@@ -0,0 +1,69 @@
+from chatter_index import ActiveChatterIndex
+
+
+class Slot:
+    """State of a single user slot shown on the dashboard"""
+
+    def __init__(self, number, seconds_active=450, max_users=2000):
+        self.number = str(number)
+        self.current_user = None
+        self.tts_enabled = True
+        self.voice = 'Joanna'
+        self.keypassphrase = f"!player{number}"
+        self.user_pool = ActiveChatterIndex(seconds_active, max_users)
+
+
+class SlotTable:
+    """Any number of user slots with dict-based message routing.
+
+    Incoming chat is routed with a single lookup from the lowercased author
+    to the slot that selected them, so messages from everyone else are
+    rejected without comparing against each slot in turn.
+    """
+
+    def __init__(self, count=3, seconds_active=450, max_users=2000):
+        self.slots = {}  # slot number (as a string) -> Slot
+        for i in range(1, count + 1):
+            slot = Slot(i, seconds_active, max_users)
+            self.slots[slot.number] = slot
+        self._by_author = {}
+        self._by_passphrase = {slot.keypassphrase: slot for slot in self.slots.values()}
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __iter__(self):
+        return iter(self.slots.values())
+
+    def __contains__(self, user_number):
+        return user_number in self.slots
+
+    def get(self, user_number):
+        return self.slots.get(user_number)
+
+    def numbers(self):
+        return list(self.slots.keys())
+
+    def for_author(self, author):
+        """Return the slot that selected this chatter, or None"""
+        return self._by_author.get(author.lower())
+
+    def for_passphrase(self, content):
+        """Return the slot whose registration command this is, or None"""
+        return self._by_passphrase.get(content)
+
+    def set_user(self, user_number, username):
+        """Select a chatter for a slot and update the routing table"""
+        slot = self.slots[user_number]
+        slot.current_user = username.lower() if username else None
+        self._rebuild_author_index()
+        return slot
+
+    def _rebuild_author_index(self):
+        # Walk the slots backwards so the lowest numbered slot wins when the
+        # same chatter is selected in more than one slot
+        by_author = {}
+        for slot in reversed(list(self.slots.values())):
+            if slot.current_user:
+                by_author[slot.current_user] = slot
+        self._by_author = by_author
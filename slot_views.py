@@ -0,0 +1,63 @@
+"""
+Server-side view model of the slots shown by dashboards and overlays.
+
+Every change to what a slot displays (selected user, last message, TTS
+switch, voice) goes through SlotViews.update(), which stamps the slot's
+state with a new version and returns it as the 'slot_update' payload.
+A connecting client is sent a 'slot_snapshot' of the slots it shows, and
+then skips any update whose version isn't newer than what it has, so an
+update that was in flight while it connected can't overwrite the snapshot.
+"""
+
+import itertools
+import threading
+import time
+
+SLOT_UPDATE = 'slot_update'
+SLOT_SNAPSHOT = 'slot_snapshot'
+
+FIELDS = ('current_user', 'message', 'tts', 'voice')
+
+
+class SlotViews:
+    """Latest displayed state of every slot, per channel"""
+
+    def __init__(self):
+        self._views = {}  # (channel, user number) -> view dict
+        self._lock = threading.Lock()
+        # Seeded from the wall clock so versions keep increasing across restarts of the app
+        self._versions = itertools.count(int(time.time() * 1000))
+
+    def update(self, channel, user_number, **fields):
+        """Change some fields of a slot's view and return the whole new view"""
+        unknown = set(fields) - set(FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown slot view field(s): {', '.join(sorted(unknown))}")
+        with self._lock:
+            view = self._get(channel, user_number)
+            view.update(fields)
+            view['version'] = next(self._versions)
+            return dict(view)
+
+    def apply(self, view):
+        """Store a view produced by another process, returns False if it's older than the one held"""
+        with self._lock:
+            current = self._get(view['channel'], view['user_number'])
+            if view['version'] <= current['version']:
+                return False
+            current.update(view)
+            return True
+
+    def snapshot(self, channel, user_numbers):
+        """Views of the given slots, as sent to a connecting client"""
+        with self._lock:
+            return [dict(self._get(channel, user_number)) for user_number in user_numbers]
+
+    def _get(self, channel, user_number):
+        view = self._views.get((channel, user_number))
+        if view is None:
+            view = self._views[(channel, user_number)] = {
+                'channel': channel, 'user_number': user_number, 'version': 0,
+                **{field: None for field in FIELDS}
+            }
+        return view
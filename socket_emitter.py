@@ -0,0 +1,82 @@
+import threading
+
+import metrics
+
+DASHBOARD_ROOM = 'dashboard'
+
+
+def dashboard_room(channel=None):
+    """Name of the Socket.IO room joined by dashboards, per channel in multi-channel mode"""
+    return f"{channel}/{DASHBOARD_ROOM}" if channel else DASHBOARD_ROOM
+
+
+def slot_room(user_number, channel=None):
+    """Name of the Socket.IO room joined by overlays for a single slot"""
+    return f"{channel}/slot_{user_number}" if channel else f"slot_{user_number}"
+
+
+class SocketEmitter:
+    """Targeted Socket.IO emits with optional batching.
+
+    Slot events go to the dashboard room and to that slot's overlay room
+    only, so an overlay never receives traffic for other slots. When
+    batch_interval is set, events are buffered per room and flushed as a
+    single 'event_batch' frame per interval.
+    """
+
+    def __init__(self, socketio, batch_interval=0):
+        self.socketio = socketio
+        self.batch_interval = batch_interval
+        self._buffers = {}  # room -> list of {'event', 'data'}
+        self._lock = threading.Lock()
+        self._flusher = None
+        self.events = 0
+        self.frames = 0
+
+    def emit_to_slot(self, event, data, user_number, channel=None):
+        """Send a slot event to the dashboard and that slot's overlays"""
+        self.emit(event, data, dashboard_room(channel))
+        self.emit(event, data, slot_room(user_number, channel))
+
+    def emit(self, event, data, room):
+        metrics.socketio_emits.inc(event=event)
+        if self.batch_interval <= 0:
+            self.events += 1
+            self.frames += 1
+            metrics.socketio_frames.inc()
+            self._send(event, data, room)
+            return
+        with self._lock:
+            self.events += 1
+            if not self._buffers:
+                self._schedule_flush()
+            self._buffers.setdefault(room, []).append({'event': event, 'data': data})
+
+    def flush(self):
+        """Send everything buffered, one frame per room"""
+        with self._lock:
+            buffers, self._buffers = self._buffers, {}
+            self.frames += len(buffers)
+        if buffers:
+            metrics.socketio_frames.inc(len(buffers))
+        for room, events in buffers.items():
+            if len(events) == 1:
+                self._send(events[0]['event'], events[0]['data'], room)
+            else:
+                self._send('event_batch', events, room)
+
+    def get_stats(self):
+        return {'events': self.events, 'frames': self.frames}
+
+    def _send(self, event, data, room):
+        self.socketio.emit(event, data, to=room)
+
+    def _schedule_flush(self):
+        """Arrange for flush() to run once batch_interval has passed"""
+        if self._flusher is None:
+            self._flusher = self.socketio.start_background_task(self._flush_loop)
+
+    def _flush_loop(self):
+        while True:
+            self.socketio.sleep(self.batch_interval)
+            self.flush()
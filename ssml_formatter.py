@@ -0,0 +1,131 @@
+import re
+from functools import lru_cache
+
+# Chat markers and the SSML they map to. Paired effects are (open, close)
+# tuples and stay active until the next paired effect; single tags are
+# inserted in place.
+EMOTIONS = {
+    'high': ('<prosody pitch="+30%">', '</prosody>'),
+    'higher': ('<amazon:effect vocal-tract-length="-80%">', '</amazon:effect>'),
+    'deep': ('<prosody pitch="-30%">', '</prosody>'),
+    'deeper': ('<amazon:effect vocal-tract-length="+80%">', '</amazon:effect>'),
+    'drunk': ('<prosody rate="x-slow">', '</prosody>'),
+    'asthma': ('<amazon:auto-breaths volume="x-loud" frequency="x-high", duration="x-short">', '</amazon:auto-breaths>'),
+    'soft': ('<prosody volume="x-soft">', '</prosody>'),
+    'loud': ('<prosody volume="x-loud">', '</prosody>'),
+    'whisper': ('<amazon:effect name="whispered">', '</amazon:effect>'),
+    'breath': '<amazon:breath duration="x-long" volume="x-loud"/>',
+}
+
+EMOTION_PATTERN = re.compile(r'\((\w+)\)')
+
+FORMAT_CACHE_SIZE = 1024
+
+
+@lru_cache(maxsize=FORMAT_CACHE_SIZE)
+def format_ssml(text):
+    """Convert chat text with (emotion) markers into an SSML document"""
+    result = ['<speak>']
+    append = result.append
+    close_tag = None
+    last_end = 0
+
+    for match in EMOTION_PATTERN.finditer(text):
+        start = match.start()
+        if start > last_end:
+            append(text[last_end:start])
+        last_end = match.end()
+
+        # Unknown markers are dropped from the spoken text
+        tag = EMOTIONS.get(match.group(1).lower())
+        if tag is None:
+            continue
+        if isinstance(tag, tuple):
+            if close_tag:
+                append(close_tag)
+            append(tag[0])
+            close_tag = tag[1]
+        else:
+            append(tag)
+
+    if last_end < len(text):
+        append(text[last_end:])
+    if close_tag:
+        append(close_tag)
+    append('</speak>')
+    return ''.join(result)
+
+
+SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+')
+
+CHUNK_MIN_CHARS = 120
+
+
+@lru_cache(maxsize=FORMAT_CACHE_SIZE)
+def format_ssml_chunks(text, min_chars=CHUNK_MIN_CHARS):
+    """Convert chat text into one or more SSML documents that play back to back.
+
+    A new chunk starts at a sentence end or an effect change once the
+    current chunk holds at least min_chars of text. The active paired
+    effect is closed at the end of a chunk and reopened at the start of the
+    next one, so every chunk is a valid document that sounds the same as
+    the matching part of format_ssml(text).
+    """
+    chunks = []
+    parts = ['<speak>']
+    spoken = 0  # characters of text in the current chunk
+    has_content = False
+    open_tag = close_tag = None
+
+    def split(reopen=True):
+        nonlocal parts, spoken, has_content
+        if close_tag and reopen:
+            parts.append(close_tag)
+        parts.append('</speak>')
+        chunks.append(''.join(parts))
+        parts = ['<speak>', open_tag] if open_tag and reopen else ['<speak>']
+        spoken = 0
+        has_content = False
+
+    def add_text(segment):
+        nonlocal spoken, has_content
+        for i, sentence in enumerate(SENTENCE_BREAK.split(segment)):
+            if i:
+                if spoken >= min_chars:
+                    split()
+                else:
+                    parts.append(' ')
+            if sentence:
+                parts.append(sentence)
+                spoken += len(sentence)
+                has_content = True
+
+    last_end = 0
+    for match in EMOTION_PATTERN.finditer(text):
+        start = match.start()
+        if start > last_end:
+            add_text(text[last_end:start])
+        last_end = match.end()
+
+        tag = EMOTIONS.get(match.group(1).lower())
+        if tag is None:
+            continue
+        if isinstance(tag, tuple):
+            if spoken >= min_chars:
+                # Effect boundary, end the chunk instead of closing the old effect in place
+                if close_tag:
+                    parts.append(close_tag)
+                split(reopen=False)
+            elif close_tag:
+                parts.append(close_tag)
+            parts.append(tag[0])
+            open_tag, close_tag = tag
+        else:
+            parts.append(tag)
+            has_content = True
+
+    if last_end < len(text):
+        add_text(text[last_end:])
+    if has_content or not chunks:
+        split()
+    return tuple(chunks)
@@ -0,0 +1,135 @@
+"""
+Parallel startup of the app's external dependencies.
+
+Each subsystem (audio device, Polly, OBS, Twitch) is brought up on its
+own thread so a slow one never holds up the others or the web server.
+Every step has a timeout after which it is reported as timed out, and
+get_status() feeds the /ready endpoint with the state and time-to-ready
+of each subsystem.
+"""
+
+import threading
+import time
+
+from rich import print
+
+PENDING = 'pending'
+STARTING = 'starting'
+READY = 'ready'
+FAILED = 'failed'
+TIMEOUT = 'timeout'
+DISABLED = 'disabled'
+
+
+class Subsystem:
+    def __init__(self, name, timeout, required):
+        self.name = name
+        self.timeout = timeout
+        self.required = required  # the app isn't ready until required subsystems are
+        self.state = PENDING
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+
+    def get_state(self, now):
+        if self.state == STARTING and now - self.started_at > self.timeout:
+            return TIMEOUT
+        return self.state
+
+
+class StartupTracker:
+    """Runs startup steps concurrently and tracks which subsystems are up"""
+
+    def __init__(self):
+        self.created_at = time.monotonic()
+        self._subsystems = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def begin(self, name, timeout=10, required=True):
+        """Mark a subsystem as starting, for steps driven from elsewhere"""
+        with self._lock:
+            subsystem = self._subsystems[name] = Subsystem(name, timeout, required)
+            subsystem.state = STARTING
+            subsystem.started_at = time.monotonic()
+        watchdog = threading.Timer(timeout, self._check_timeout, args=(subsystem,))
+        watchdog.daemon = True
+        watchdog.start()
+
+    def finish(self, name, ok=True, error=None):
+        """Mark a subsystem as up, or as failed with an error message"""
+        with self._lock:
+            subsystem = self._subsystems.get(name)
+            if subsystem is None:
+                return
+            subsystem.state = READY if ok else FAILED
+            subsystem.error = None if ok else error
+            subsystem.finished_at = time.monotonic()
+            elapsed = subsystem.finished_at - subsystem.started_at
+            self._changed.notify_all()
+        if ok:
+            print(f"[green]Startup: {name} ready after {elapsed:.2f}s[/green]")
+        else:
+            print(f"[red]Startup: {name} failed after {elapsed:.2f}s: {error}[/red]")
+
+    def skip(self, name, reason):
+        """Record a subsystem that is turned off by configuration"""
+        with self._lock:
+            subsystem = self._subsystems[name] = Subsystem(name, 0, required=False)
+            subsystem.state = DISABLED
+            subsystem.error = reason
+            self._changed.notify_all()
+
+    def run(self, name, func, timeout=10, required=True):
+        """Run func() on its own thread; a truthy result marks the subsystem ready"""
+        self.begin(name, timeout, required)
+
+        def target():
+            try:
+                ok = bool(func())
+                self.finish(name, ok, None if ok else 'startup step returned no result')
+            except Exception as e:
+                self.finish(name, False, str(e))
+
+        thread = threading.Thread(target=target, name=f"startup-{name}", daemon=True)
+        thread.start()
+        return thread
+
+    def wait(self, timeout=None):
+        """Block until every subsystem has finished starting, returns True if all are up"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            while any(subsystem.state == STARTING for subsystem in self._subsystems.values()):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._changed.wait(remaining)
+        return self.get_status()['ready']
+
+    def is_ready(self, name):
+        with self._lock:
+            subsystem = self._subsystems.get(name)
+            return subsystem is not None and subsystem.state == READY
+
+    def get_status(self):
+        """State of every subsystem and whether all required ones are up"""
+        now = time.monotonic()
+        with self._lock:
+            subsystems = {}
+            for name, subsystem in self._subsystems.items():
+                state = subsystem.get_state(now)
+                info = {'state': state, 'required': subsystem.required}
+                if subsystem.started_at is not None:
+                    end = subsystem.finished_at if subsystem.finished_at is not None else now
+                    info['seconds'] = round(end - subsystem.started_at, 3)
+                if subsystem.error:
+                    info['reason' if state == DISABLED else 'error'] = subsystem.error
+                subsystems[name] = info
+        ready = bool(subsystems) and all(info['state'] == READY for info in subsystems.values() if info['required'])
+        return {'ready': ready, 'uptime': round(now - self.created_at, 3), 'subsystems': subsystems}
+
+    def _check_timeout(self, subsystem):
+        with self._lock:
+            timed_out = subsystem.state == STARTING
+        if timed_out:
+            print(f"[yellow]Startup: {subsystem.name} is not up after {subsystem.timeout:g}s, continuing without it[/yellow]")
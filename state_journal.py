@@ -0,0 +1,199 @@
+"""
+Append-only journal of slot state for warm restarts.
+
+Every change to a slot (selected user, voice, TTS on/off) and every chatter
+registration is handed to a background writer thread, which appends it to
+<channel>.journal.jsonl. The writer keeps the current state in memory and
+periodically compacts it into <channel>.snapshot.json, truncating the
+journal, so loading at startup only parses one small snapshot plus the
+records written since.
+
+Registration times are stored as wall clock times, so chatters who went
+quiet while the bot was down expire from the pools as usual.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+
+from rich import print
+
+SNAPSHOT_VERSION = 1
+
+
+class ChannelState:
+    """Slots and chatter pools of one channel as the journal knows them"""
+
+    def __init__(self):
+        self.slots = {}  # slot number -> {'user', 'voice', 'tts'}
+        self.pools = {}  # slot number -> {chatter name: wall clock time last seen}
+        self.records = 0  # journal records since the last snapshot
+
+    def apply(self, record):
+        op = record.get('op')
+        if op == 'slot':
+            self.slots[record['slot']] = {key: record.get(key) for key in ('user', 'voice', 'tts')}
+        elif op == 'seen':
+            pool = self.pools.setdefault(record['slot'], {})
+            pool[record['name']] = max(record['t'], pool.get(record['name'], 0))
+
+    def prune(self, seconds_active, max_users, now):
+        """Drop chatters the bot would already have expired"""
+        threshold = now - seconds_active
+        for slot, pool in self.pools.items():
+            active = sorted(((seen, name) for name, seen in pool.items() if seen >= threshold), reverse=True)
+            self.pools[slot] = {name: seen for seen, name in active[:max_users]}
+
+    def to_json(self):
+        return {'version': SNAPSHOT_VERSION, 'saved_at': time.time(), 'slots': self.slots, 'pools': self.pools}
+
+
+class StateJournal:
+    """Journals slot state per channel on a background thread and restores it at startup"""
+
+    def __init__(self, directory, seconds_active=450, max_users=2000, snapshot_interval=60, max_records=10000):
+        self.directory = directory
+        self.seconds_active = seconds_active
+        self.max_users = max_users
+        self.snapshot_interval = snapshot_interval  # seconds between compactions of a changed journal
+        self.max_records = max_records  # compact early once a journal has this many records
+        self._states = {}  # channel -> ChannelState, only touched by the writer after load()
+        self._files = {}  # channel -> open journal file
+        self._queue = queue.SimpleQueue()
+        self._closed = False
+        self.written = 0
+        self.snapshots = 0
+        os.makedirs(directory, exist_ok=True)
+        self._writer = threading.Thread(target=self._write_loop, name="state-journal", daemon=True)
+        self._writer.start()
+
+    def _path(self, channel, kind):
+        return os.path.join(self.directory, f"{channel}.{kind}")
+
+    def load(self, channel):
+        """Read a channel's snapshot and journal, returns its ChannelState"""
+        state = ChannelState()
+        try:
+            with open(self._path(channel, 'snapshot.json')) as f:
+                snapshot = json.load(f)
+            if snapshot.get('version') == SNAPSHOT_VERSION:
+                state.slots = snapshot.get('slots', {})
+                state.pools = snapshot.get('pools', {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"[yellow]Warning: Ignoring unreadable state snapshot for #{channel}: {e}[/yellow]")
+        path = self._path(channel, 'journal.jsonl')
+        try:
+            with open(path, 'rb') as f:
+                end = 0  # offset after the last complete record
+                for line in f:
+                    try:
+                        if not line.endswith(b'\n'):
+                            raise ValueError("record has no line end")
+                        state.apply(json.loads(line))
+                    except (ValueError, KeyError):
+                        break  # a record cut short by a crash, nothing after it is complete
+                    state.records += 1
+                    end += len(line)
+                torn = f.tell() > end
+            if torn:
+                # Otherwise the next record would be appended to the torn line and lost with it
+                print(f"[yellow]Warning: Discarding a torn record from the state journal of #{channel}[/yellow]")
+                os.truncate(path, end)
+        except FileNotFoundError:
+            pass
+        state.prune(self.seconds_active, self.max_users, time.time())
+        self._states[channel] = state
+        return state
+
+    def record_slot(self, channel, slot):
+        """Journal a slot's selected user, voice and TTS setting"""
+        self._put(channel, {'op': 'slot', 'slot': slot.number, 'user': slot.current_user,
+                            'voice': slot.voice, 'tts': slot.tts_enabled})
+
+    def record_seen(self, channel, slot_number, name):
+        """Journal that a chatter registered for a slot"""
+        self._put(channel, {'op': 'seen', 'slot': slot_number, 'name': name, 't': round(time.time(), 1)})
+
+    def close(self):
+        """Write everything still queued and a final snapshot"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join(timeout=5)
+
+    def get_stats(self):
+        return {'written': self.written, 'snapshots': self.snapshots, 'pending': self._queue.qsize()}
+
+    def _put(self, channel, record):
+        # Called from the IRC loop, so the only work here is the queue put
+        if self._closed:
+            return
+        self._queue.put((channel, record))
+
+    def _write_loop(self):
+        last_snapshot = time.monotonic()
+        running = True
+        while running:
+            try:
+                items = [self._queue.get(timeout=self.snapshot_interval)]
+            except queue.Empty:
+                items = []
+            # Drain whatever else is queued so a burst becomes one write per file
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in items:
+                running = False
+                items = [item for item in items if item is not None]
+            try:
+                self._append(items)
+                due = time.monotonic() - last_snapshot >= self.snapshot_interval
+                for channel, state in list(self._states.items()):
+                    if state.records and (due or not running or state.records >= self.max_records):
+                        self._snapshot(channel, state)
+                if due:
+                    last_snapshot = time.monotonic()
+            except OSError as e:
+                print(f"[red]Error writing the state journal: {e}[/red]")
+
+    def _append(self, items):
+        lines = {}
+        for channel, record in items:
+            state = self._states.get(channel)
+            if state is None:
+                # Never restored, pick up what's on disk so the next snapshot doesn't lose it
+                state = self.load(channel)
+            state.apply(record)
+            state.records += 1
+            lines.setdefault(channel, []).append(json.dumps(record, separators=(',', ':')) + '\n')
+        for channel, channel_lines in lines.items():
+            f = self._files.get(channel)
+            if f is None:
+                f = self._files[channel] = open(self._path(channel, 'journal.jsonl'), 'a')
+            f.writelines(channel_lines)
+            f.flush()
+            self.written += len(channel_lines)
+
+    def _snapshot(self, channel, state):
+        """Replace the snapshot with the current state and start an empty journal"""
+        state.prune(self.seconds_active, self.max_users, time.time())
+        path = self._path(channel, 'snapshot.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(state.to_json(), f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+        # Records already in the snapshot may be replayed again if we crash before this, which is harmless
+        f = self._files.pop(channel, None)
+        if f is not None:
+            f.close()
+        open(self._path(channel, 'journal.jsonl'), 'w').close()
+        state.records = 0
+        self.snapshots += 1
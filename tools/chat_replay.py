@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Record, generate and replay Twitch chat for offline end-to-end load tests.
+
+  record    Log a live channel's chat to a JSONL file (anonymous, no token needed)
+  generate  Write a deterministic synthetic chat file, e.g. a raid of !playerN registrations
+  replay    Serve a local Twitch IRC stand-in and push a chat file through it at 1x, 10x, 100x...
+
+Each line of a chat file is {"t": seconds since start, "user": ..., "content": ..., "tags": {...}}.
+
+To replay, start the stand-in first and then the app pointed at it:
+  python tools/chat_replay.py replay chat.jsonl --speed 10
+  TWITCH_IRC_HOST=ws://localhost:6667 python main.py
+
+Usage: python tools/chat_replay.py record CHANNEL [--output chat.jsonl] [--duration 600]
+       python tools/chat_replay.py generate [--output raid.jsonl] [--registrations 5000] [--per-minute 3000]
+       python tools/chat_replay.py replay FILE [--speed 1] [--port 6667] [--channel NAME]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from irc_standin import IRCStandIn
+
+TWITCH_IRC_URL = 'wss://irc-ws.chat.twitch.tv:443'
+
+
+def parse_privmsg(line):
+    """Split a tagged PRIVMSG line into (user, content, tags), or None for other lines"""
+    tags = {}
+    if line.startswith('@'):
+        raw_tags, _, line = line[1:].partition(' ')
+        for tag in raw_tags.split(';'):
+            key, _, value = tag.partition('=')
+            tags[key] = (value.replace('\\s', ' ').replace('\\:', ';')
+                         .replace('\\r', '\r').replace('\\n', '\n').replace('\\\\', '\\'))
+    prefix, _, rest = line.partition(' ')
+    command, _, rest = rest.partition(' ')
+    if command != 'PRIVMSG':
+        return None
+    content = rest.partition(' :')[2]
+    user = prefix.lstrip(':').partition('!')[0]
+    # Replay assigns fresh ids and timestamps
+    for key in ('id', 'tmi-sent-ts', 'room-id'):
+        tags.pop(key, None)
+    return user, content, tags
+
+
+def load_chat(path):
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    records.sort(key=lambda record: record['t'])
+    return records
+
+
+async def record(args):
+    import aiohttp
+
+    channel = args.channel.lstrip('#').lower()
+    count = 0
+    start = time.monotonic()
+    async with aiohttp.ClientSession() as session:
+        async with session.ws_connect(TWITCH_IRC_URL) as ws:
+            # justinfan nicks read chat anonymously
+            await ws.send_str('CAP REQ :twitch.tv/tags twitch.tv/commands\r\n')
+            await ws.send_str('PASS SCHMOOPIIE\r\n')
+            await ws.send_str(f'NICK justinfan{random.randrange(10000, 99999)}\r\n')
+            await ws.send_str(f'JOIN #{channel}\r\n')
+            print(f"Recording #{channel} to {args.output}, press Ctrl+C to stop")
+            with open(args.output, 'w') as out:
+                while args.duration is None or time.monotonic() - start < args.duration:
+                    try:
+                        msg = await asyncio.wait_for(ws.receive(), timeout=1)
+                    except asyncio.TimeoutError:
+                        continue
+                    if msg.type != aiohttp.WSMsgType.TEXT:
+                        break
+                    for line in msg.data.split('\r\n'):
+                        if line.startswith('PING'):
+                            await ws.send_str('PONG :tmi.twitch.tv\r\n')
+                            continue
+                        parsed = parse_privmsg(line) if line else None
+                        if parsed is None:
+                            continue
+                        user, content, tags = parsed
+                        out.write(json.dumps({'t': round(time.monotonic() - start, 3), 'user': user,
+                                              'content': content, 'tags': tags}) + '\n')
+                        out.flush()
+                        count += 1
+    print(f"Recorded {count} messages")
+
+
+def generate(args):
+    """Write a raid: a burst of !playerN registrations mixed with ordinary chat"""
+    rng = random.Random(args.seed)
+    chatters = [f"raider{i}" for i in range(args.chatters)]
+    kinds = ['register'] * args.registrations + ['chat'] * args.messages
+    rng.shuffle(kinds)
+    interval = 60.0 / args.per_minute
+    with open(args.output, 'w') as out:
+        for i, kind in enumerate(kinds):
+            user = rng.choice(chatters)
+            if kind == 'register':
+                content = f"!player{rng.randint(1, args.slots)}"
+            else:
+                content = f"hype message {i} from {user} PogChamp"
+            out.write(json.dumps({'t': round(i * interval, 3), 'user': user, 'content': content, 'tags': {}}) + '\n')
+    print(f"Wrote {len(kinds)} messages to {args.output}")
+
+
+async def replay(args):
+    records = load_chat(args.file)
+    server = IRCStandIn(args.host, args.port)
+    await server.start()
+    print(f"IRC stand-in listening on {server.url}, start the bot with TWITCH_IRC_HOST={server.url}")
+    try:
+        await server.joined.wait()
+        # Give twitchio a moment to finish logging in after the JOIN
+        await asyncio.sleep(1)
+        channels = [args.channel.lower()] if args.channel else server.channels()
+        print(f"Replaying {len(records)} messages to #{', #'.join(channels)} at {args.speed}x")
+
+        start = time.monotonic()
+        first = records[0]['t'] if records else 0
+        for record in records:
+            delay = (record['t'] - first) / args.speed - (time.monotonic() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            for channel in channels:
+                await server.send_privmsg(channel, record['user'], record['content'], record.get('tags'))
+        elapsed = time.monotonic() - start
+        rate = len(records) / elapsed * 60 if elapsed else float('inf')
+        print(f"Replayed {len(records)} messages in {elapsed:.1f}s ({rate:.0f}/min), {server.sent} lines sent")
+
+        if args.hold:
+            print("Holding the connection open, press Ctrl+C to stop")
+            await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = commands.add_parser('record', help='log a live channel to a chat file')
+    record_parser.add_argument('channel')
+    record_parser.add_argument('--output', default='chat.jsonl')
+    record_parser.add_argument('--duration', type=float, default=None, help='seconds to record, default until Ctrl+C')
+
+    generate_parser = commands.add_parser('generate', help='write a synthetic raid chat file')
+    generate_parser.add_argument('--output', default='raid.jsonl')
+    generate_parser.add_argument('--registrations', type=int, default=5000, help='number of !playerN messages')
+    generate_parser.add_argument('--messages', type=int, default=1000, help='number of ordinary chat messages')
+    generate_parser.add_argument('--per-minute', type=float, default=3000, help='chat rate of the generated file')
+    generate_parser.add_argument('--chatters', type=int, default=2000, help='distinct chatters')
+    generate_parser.add_argument('--slots', type=int, default=int(os.getenv('SLOT_COUNT', 3)))
+    generate_parser.add_argument('--seed', type=int, default=1)
+
+    replay_parser = commands.add_parser('replay', help='serve the IRC stand-in and replay a chat file')
+    replay_parser.add_argument('file')
+    replay_parser.add_argument('--speed', type=float, default=1.0, help='replay speed multiplier, e.g. 10 or 100')
+    replay_parser.add_argument('--host', default='localhost')
+    replay_parser.add_argument('--port', type=int, default=6667)
+    replay_parser.add_argument('--channel', default=None, help='channel to send to, default every joined channel')
+    replay_parser.add_argument('--hold', action='store_true', help='keep serving after the replay finishes')
+
+    args = parser.parse_args()
+    try:
+        if args.command == 'record':
+            asyncio.run(record(args))
+        elif args.command == 'generate':
+            generate(args)
+        else:
+            asyncio.run(replay(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
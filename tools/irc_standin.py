@@ -0,0 +1,151 @@
+"""
+Local stand-in for Twitch's IRC websocket.
+
+Speaks enough of the Twitch IRC protocol for twitchio to log in, join its
+channels and receive PRIVMSGs, so the bot can run against recorded or
+generated chat without a Twitch connection. Tokens aren't checked. Run
+main.py with TWITCH_IRC_HOST=ws://localhost:6667 to connect to it.
+"""
+
+import asyncio
+import itertools
+import time
+import zlib
+
+from aiohttp import WSMsgType, web
+
+SERVER = 'tmi.twitch.tv'
+
+# Tags twitchio expects on every chat message
+DEFAULT_TAGS = {
+    'badge-info': '',
+    'badges': '',
+    'color': '',
+    'emotes': '',
+    'first-msg': '0',
+    'flags': '',
+    'mod': '0',
+    'returning-chatter': '0',
+    'room-id': '1',
+    'subscriber': '0',
+    'turbo': '0',
+    'user-type': '',
+}
+
+
+def escape_tag(value):
+    """Escape a tag value the way Twitch does in IRCv3 message tags"""
+    return (str(value).replace('\\', '\\\\').replace(';', '\\:').replace(' ', '\\s')
+            .replace('\r', '\\r').replace('\n', '\\n'))
+
+
+class IRCClient:
+    def __init__(self, ws):
+        self.ws = ws
+        self.nick = None
+        self.channels = set()
+
+    async def send(self, *lines):
+        await self.ws.send_str(''.join(f'{line}\r\n' for line in lines))
+
+
+class IRCStandIn:
+    """aiohttp websocket server that twitchio can log in to"""
+
+    def __init__(self, host='localhost', port=6667):
+        self.host = host
+        self.port = port
+        self.clients = []
+        self.joined = asyncio.Event()  # set once a client has joined a channel
+        self.sent = 0
+        self._ids = itertools.count(1)
+        self._runner = None
+
+    @property
+    def url(self):
+        return f'ws://{self.host}:{self.port}'
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/', self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+
+    async def stop(self):
+        for client in list(self.clients):
+            await client.ws.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def channels(self):
+        """Channels joined by any connected client"""
+        return sorted(set().union(*(client.channels for client in self.clients))) if self.clients else []
+
+    async def send_privmsg(self, channel, user, content, tags=None):
+        """Deliver a chat message to every client in the channel"""
+        user = user.lower()
+        all_tags = dict(DEFAULT_TAGS)
+        all_tags.update(tags or {})
+        all_tags.setdefault('display-name', user)
+        all_tags.setdefault('user-id', str(zlib.crc32(user.encode())))
+        all_tags['id'] = f'standin-{next(self._ids)}'
+        all_tags['tmi-sent-ts'] = str(int(time.time() * 1000))
+        tag_string = ';'.join(f'{key}={escape_tag(value)}' for key, value in all_tags.items())
+        content = content.replace('\r', ' ').replace('\n', ' ')
+        line = f'@{tag_string} :{user}!{user}@{user}.{SERVER} PRIVMSG #{channel} :{content}'
+        for client in self.clients:
+            if channel in client.channels:
+                await client.send(line)
+                self.sent += 1
+
+    async def _handle(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        client = IRCClient(ws)
+        self.clients.append(client)
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                for line in msg.data.split('\r\n'):
+                    if line:
+                        await self._command(client, line)
+        finally:
+            self.clients.remove(client)
+        return ws
+
+    async def _command(self, client, line):
+        command, _, argument = line.partition(' ')
+        command = command.upper()
+        if command == 'NICK':
+            client.nick = argument.strip().lower()
+            nick = client.nick
+            await client.send(
+                f':{SERVER} 001 {nick} :Welcome, GLHF!',
+                f':{SERVER} 002 {nick} :Your host is {SERVER}',
+                f':{SERVER} 003 {nick} :This server is rather new',
+                f':{SERVER} 004 {nick} :-',
+                f':{SERVER} 375 {nick} :-',
+                f':{SERVER} 372 {nick} :You are in a maze of twisty passages, all alike.',
+                f':{SERVER} 376 {nick} :>',
+            )
+        elif command == 'CAP':
+            capabilities = argument.partition(':')[2]
+            await client.send(f':{SERVER} CAP * ACK :{capabilities}')
+        elif command == 'JOIN':
+            nick = client.nick
+            for channel in argument.split(','):
+                channel = channel.strip().lstrip('#').lower()
+                client.channels.add(channel)
+                await client.send(
+                    f':{nick}!{nick}@{nick}.{SERVER} JOIN #{channel}',
+                    f':{nick}.{SERVER} 353 {nick} = #{channel} :{nick}',
+                    f':{nick}.{SERVER} 366 {nick} #{channel} :End of /NAMES list',
+                )
+            self.joined.set()
+        elif command == 'PART':
+            client.channels.discard(argument.strip().lstrip('#').lower())
+        elif command == 'PING':
+            await client.send(f':{SERVER} PONG {SERVER} :{argument.lstrip(":")}')
+        # PASS, PONG and the bot's own PRIVMSGs need no reply
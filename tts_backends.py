@@ -0,0 +1,298 @@
+"""
+Speech synthesis backends and the router that picks one per request.
+
+Every backend turns an SSML document (as produced by format_ssml) into
+audio bytes pygame can load. Polly gives the best voices but costs a
+network round trip; the local espeak-ng engine runs as a subprocess with
+no network at all. BackendRouter orders the backends for each request
+from the latency and failures it has observed per voice, and TTSManager
+falls through that order until one succeeds.
+"""
+
+import html
+import io
+import re
+import shutil
+import subprocess
+import threading
+import time
+
+import metrics
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+SSML_TAG = re.compile(r'<[^>]+>')
+
+BACKEND_MODES = ('polly', 'local', 'auto')
+
+# Polly output formats and the sample rates it offers for each. pcm is
+# headerless signed 16-bit little-endian mono.
+OUTPUT_FORMATS = {
+    'mp3': (8000, 16000, 22050, 24000),
+    'ogg_vorbis': (8000, 16000, 22050, 24000),
+    'pcm': (8000, 16000),
+}
+
+
+def strip_ssml(text):
+    """Plain text of an SSML document, dropping the Polly-only effect tags"""
+    return html.unescape(SSML_TAG.sub('', text)).strip()
+
+
+class TTSBackend:
+    """Interface implemented by every speech backend"""
+
+    name = None
+    local = False  # True when synthesis needs no network
+
+    def available(self):
+        return True
+
+    def synthesize(self, text, voice_id, output_format, sample_rate=None):
+        """Return audio bytes for an SSML document, or None if nothing was produced"""
+        raise NotImplementedError
+
+
+class PollyBackend(TTSBackend):
+    """Amazon Polly over a pooled, keep-alive HTTP client"""
+
+    name = 'polly'
+
+    def __init__(self, aws_access_key_id=None, aws_secret_access_key=None, region_name='us-east-1',
+                 max_pool_connections=10, connect_timeout=3, read_timeout=10, endpoint_url=None):
+        self._buffers = threading.local()  # one reusable read buffer per worker thread
+        self.max_pool_connections = max_pool_connections
+        self._client_args = {
+            'aws_access_key_id': aws_access_key_id,
+            'aws_secret_access_key': aws_secret_access_key,
+            'region_name': region_name,
+            'endpoint_url': endpoint_url,  # lets a local stand-in Polly endpoint be used
+        }
+        self._timeouts = (connect_timeout, read_timeout)
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        """boto3 Polly client, created on first use since importing boto3 is slow"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import boto3
+                    from botocore.config import Config
+
+                    connect_timeout, read_timeout = self._timeouts
+                    self._client = boto3.client(
+                        'polly',
+                        config=Config(
+                            max_pool_connections=self.max_pool_connections,
+                            connect_timeout=connect_timeout,
+                            read_timeout=read_timeout,
+                            tcp_keepalive=True,
+                            retries={'max_attempts': 2, 'mode': 'standard'}
+                        ),
+                        **self._client_args
+                    )
+        return self._client
+
+    def synthesize(self, text, voice_id, output_format, sample_rate=None):
+        start = time.perf_counter()
+        kwargs = {'SampleRate': str(sample_rate)} if sample_rate else {}
+        try:
+            response = self.client.synthesize_speech(
+                Text=text,
+                VoiceId=voice_id,
+                OutputFormat=output_format,
+                TextType='ssml' if text.strip().startswith('<speak>') else 'text',
+                **kwargs
+            )
+            audio_stream = response.get('AudioStream')
+            if not audio_stream:
+                metrics.polly_requests.inc(result='empty')
+                return None
+            audio = self._read_stream(audio_stream)
+        except Exception:
+            metrics.polly_requests.inc(result='error')
+            raise
+        metrics.polly_seconds.observe(time.perf_counter() - start, voice_id=voice_id)
+        metrics.polly_requests.inc(result='ok')
+        metrics.polly_bytes.inc(len(audio))
+        return audio
+
+    def describe_voices(self, language_prefix='en-'):
+        """Standard engine voices as (voice id, label)"""
+        voices = []
+        kwargs = {'Engine': 'standard'}
+        while True:
+            response = self.client.describe_voices(**kwargs)
+            for voice in response.get('Voices', []):
+                if voice['LanguageCode'].startswith(language_prefix):
+                    voices.append((voice['Id'], f"{voice['Name']} ({voice['Gender']}, {voice['LanguageName']})"))
+            if not response.get('NextToken'):
+                break
+            kwargs['NextToken'] = response['NextToken']
+        return voices
+
+    def _read_stream(self, audio_stream):
+        """Drain a Polly AudioStream through this thread's reusable buffer"""
+        buffer = getattr(self._buffers, 'buffer', None)
+        if buffer is None:
+            buffer = self._buffers.buffer = io.BytesIO()
+        buffer.seek(0)
+        buffer.truncate()
+        try:
+            for chunk in audio_stream.iter_chunks(STREAM_CHUNK_SIZE):
+                buffer.write(chunk)
+        finally:
+            audio_stream.close()
+        return buffer.getvalue()
+
+
+# espeak-ng voices that roughly match the Polly voices offered in the dashboard
+LOCAL_VOICES = {
+    'Joanna': 'en-us+f3',
+    'Ivy': 'en-us+f4',
+    'Kendra': 'en-us+f2',
+    'Kimberly': 'en-us+f5',
+    'Salli': 'en-us+f1',
+    'Ruth': 'en-us+f2',
+    'Matthew': 'en-us+m3',
+    'Justin': 'en-us+m5',
+    'Joey': 'en-us+m1',
+    'Amy': 'en-gb+f3',
+    'Emma': 'en-gb+f2',
+    'Brian': 'en-gb+m3',
+    'Geraint': 'en-gb-x-rp+m1',
+}
+
+
+class LocalBackend(TTSBackend):
+    """Offline espeak-ng engine run as a subprocess, returns WAV audio.
+
+    The (emotion) effects are Polly-specific, so their SSML tags are
+    stripped and the text is spoken plainly. espeak-ng has a fixed output
+    format, so the requested format and sample rate are ignored and the
+    WAV header tells AudioManager to decode it.
+    """
+
+    name = 'local'
+    local = True
+
+    def __init__(self, binary='espeak-ng', words_per_minute=175, voices=None, timeout=10):
+        self.binary = shutil.which(binary) or shutil.which('espeak')
+        self.words_per_minute = words_per_minute
+        self.voices = voices or LOCAL_VOICES
+        self.timeout = timeout
+
+    def available(self):
+        return self.binary is not None
+
+    def synthesize(self, text, voice_id, output_format, sample_rate=None):
+        text = strip_ssml(text)
+        if not text:
+            return None
+        result = subprocess.run(
+            [self.binary, '--stdout', '--stdin', '-v', self.voices.get(voice_id, 'en-us'),
+             '-s', str(self.words_per_minute)],
+            input=text.encode('utf-8'),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=self.timeout,
+            check=True
+        )
+        return result.stdout or None
+
+
+class BackendStats:
+    """Observed latency and health of one backend for one voice"""
+
+    def __init__(self):
+        self.latency = None  # exponentially weighted moving average in seconds
+        self.failures = 0  # consecutive failures
+        self.open_until = 0.0  # skipped as the first choice until then
+        self.last_attempt = 0.0
+
+
+class BackendRouter:
+    """Orders the backends for each request from their observed latency.
+
+    In 'polly' or 'local' mode that backend is always tried first, with the
+    other one as a fallback if it fails. In 'auto' mode short messages go to
+    the local engine, and Polly is only tried first for a voice while its
+    recent latency is within latency_budget and it hasn't failed
+    failure_threshold times in a row. A voice that was routed away is
+    retried on Polly every probe_interval seconds so it can recover.
+    """
+
+    def __init__(self, backends, mode='polly', local_max_chars=0, latency_budget=1.5,
+                 failure_threshold=3, cooldown=30, probe_interval=15, smoothing=0.3):
+        if mode not in BACKEND_MODES:
+            raise ValueError(f"Unknown TTS backend mode '{mode}', expected one of {BACKEND_MODES}")
+        self.backends = [backend for backend in backends if backend.available()]
+        if not self.backends:
+            raise ValueError("No TTS backend is available")
+        self.mode = mode
+        self.local_max_chars = local_max_chars
+        self.latency_budget = latency_budget
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.probe_interval = probe_interval
+        self.smoothing = smoothing
+        self._stats = {}  # (backend name, voice id) -> BackendStats
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        for backend in self.backends:
+            if backend.name == name:
+                return backend
+        return None
+
+    def candidates(self, text, voice_id):
+        """Backends to try for a request, best first"""
+        remote = [backend for backend in self.backends if not backend.local]
+        local = [backend for backend in self.backends if backend.local]
+        if self.mode == 'local':
+            return local + remote
+        if self.mode == 'polly' or not local or not remote:
+            return remote + local
+
+        if self.local_max_chars and len(strip_ssml(text)) <= self.local_max_chars:
+            return local + remote
+        now = time.monotonic()
+        with self._lock:
+            healthy = [backend for backend in remote if self._usable(backend, voice_id, now)]
+        slow = [backend for backend in remote if backend not in healthy]
+        return healthy + local + slow
+
+    def observe(self, backend, voice_id, seconds=None, ok=True):
+        """Record the outcome of a synthesis call"""
+        with self._lock:
+            stats = self._stats.setdefault((backend.name, voice_id), BackendStats())
+            stats.last_attempt = time.monotonic()
+            if not ok:
+                stats.failures += 1
+                if stats.failures >= self.failure_threshold:
+                    stats.open_until = stats.last_attempt + self.cooldown
+                return
+            stats.failures = 0
+            stats.open_until = 0.0
+            if stats.latency is None:
+                stats.latency = seconds
+            else:
+                stats.latency += self.smoothing * (seconds - stats.latency)
+
+    def get_stats(self):
+        with self._lock:
+            return {f"{name}/{voice_id}": {'latency': stats.latency, 'failures': stats.failures,
+                                           'open': stats.open_until > time.monotonic()}
+                    for (name, voice_id), stats in self._stats.items()}
+
+    def _usable(self, backend, voice_id, now):
+        stats = self._stats.get((backend.name, voice_id))
+        if stats is None:
+            return True
+        if stats.open_until > now:
+            return False
+        if now - stats.last_attempt >= self.probe_interval:
+            return True  # probe so a recovered backend gets used again
+        return stats.latency is None or stats.latency <= self.latency_budget
@@ -1,112 +1,181 @@
-import boto3
-import os
-import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from rich import print
+
+import metrics
+from ssml_formatter import format_ssml, format_ssml_chunks
+from tts_backends import OUTPUT_FORMATS, BackendRouter, LocalBackend, PollyBackend
+
+# Voices offered in the dashboard dropdowns as (voice id, label)
+DEFAULT_VOICES = [
+    ('Joanna', 'Joanna (Female, US)'),
+    ('Matthew', 'Matthew (Male, US)'),
+    ('Amy', 'Amy (Female, British)'),
+    ('Brian', 'Brian (Male, British)'),
+    ('Emma', 'Emma (Female, British)'),
+    ('Ivy', 'Ivy (Female, US)'),
+    ('Justin', 'Justin (Male, US)'),
+    ('Kendra', 'Kendra (Female, US)'),
+    ('Kimberly', 'Kimberly (Female, US)'),
+    ('Salli', 'Salli (Female, US)'),
+    ('Joey', 'Joey (Male, US)'),
+    ('Ruth', 'Ruth (Female, US)'),
+    ('Geraint', 'Geraint (Male, Welsh)'),
+]
 
 class TTSManager:
-    def __init__(self, aws_access_key_id=None, aws_secret_access_key=None, region_name='us-east-1'):
-        self.polly = boto3.client(
-            'polly',
+    def __init__(self, aws_access_key_id=None, aws_secret_access_key=None, region_name='us-east-1', cache=None,
+                 max_pool_connections=10, connect_timeout=3, read_timeout=10, endpoint_url=None,
+                 chunk_chars=0, chunk_workers=3, backend='polly', local_max_chars=0, latency_budget=1.5,
+                 output_format='mp3', sample_rate=None):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown audio format '{output_format}', expected one of {tuple(OUTPUT_FORMATS)}")
+        if sample_rate and sample_rate not in OUTPUT_FORMATS[output_format]:
+            raise ValueError(f"Polly can't produce {output_format} at {sample_rate} Hz, "
+                             f"expected one of {OUTPUT_FORMATS[output_format]}")
+        self.output_format = output_format
+        self.sample_rate = sample_rate  # requested from Polly to match the mixer, None uses Polly's default
+        self.cache = cache  # optional AudioCache shared by all voices
+        self.chunk_chars = chunk_chars  # minimum characters per chunk for long messages, 0 disables chunking
+        self.chunk_workers = chunk_workers
+        self._chunk_executor = None  # started on the first message that needs chunking
+        self._chunk_lock = threading.Lock()
+        self._voices = None  # voice catalog, filled by load_voices()
+        self.polly = PollyBackend(
             aws_access_key_id=aws_access_key_id,
             aws_secret_access_key=aws_secret_access_key,
-            region_name=region_name
+            region_name=region_name,
+            max_pool_connections=max_pool_connections,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            endpoint_url=endpoint_url
         )
+        self.local = LocalBackend()
+        if backend != 'polly' and not self.local.available():
+            print("[yellow]Warning: espeak-ng not found, the local TTS backend is unavailable[/yellow]")
+        self.router = BackendRouter([self.polly, self.local], mode=backend,
+                                    local_max_chars=local_max_chars, latency_budget=latency_budget)
+
+    def warm_up(self, connections=1):
+        """Open Polly connections and load the voice catalog, returns the number of voices"""
+        connections_to_open = max(1, min(connections, self.polly.max_pool_connections))
+        # Concurrent requests make the pool keep that many connections alive
+        with ThreadPoolExecutor(max_workers=connections_to_open) as executor:
+            results = [executor.submit(self.load_voices) for _ in range(connections_to_open)]
+            for result in results:
+                result.result()
+        print(f"[green]Polly warmed up with {connections_to_open} connection(s), {len(self._voices)} voices available[/green]")
+        return len(self._voices)
+
+    def load_voices(self, language_prefix='en-'):
+        """Fetch the standard engine voices from Polly and cache them for the dropdowns"""
+        self._voices = sorted(self.polly.describe_voices(language_prefix), key=lambda voice: voice[1])
+        return self._voices
+
+    def get_voices(self):
+        """Return the cached voice catalog, or the built-in list until it has loaded"""
+        return self._voices or DEFAULT_VOICES
 
     def format_text(self, text):
-        emotions = {
-            'high': ['<prosody pitch="+30%">', '</prosody>'],
-            'higher': ['<amazon:effect vocal-tract-length="-80%">', '</amazon:effect>'],
-            'deep': ['<prosody pitch="-30%">', '</prosody>'],
-            'deeper': ['<amazon:effect vocal-tract-length="+80%">', '</amazon:effect>'],
-            'drunk': ['<prosody rate="x-slow">', '</prosody>'],
-            'asthma': ['<amazon:auto-breaths volume="x-loud" frequency="x-high", duration="x-short">', '</amazon:auto-breaths>'],
-            'soft': ['<prosody volume="x-soft">', '</prosody>'],
-            'loud': ['<prosody volume="x-loud">', '</prosody>'],
-            'whisper': ['<amazon:effect name="whispered">', '</amazon:effect>'],
-            'breath': '<amazon:breath duration="x-long" volume="x-loud"/>',
-        }
-
-        import re
-        
-        # Separate emotion markers and normal text
-        parts = []
-        last_end = 0
-        
-        # Find all emotion markers in the text
-        for match in re.finditer(r'\((\w+)\)', text):
-            # Add text before this marker
-            if match.start() > last_end:
-                parts.append({
-                    'type': 'text',
-                    'content': text[last_end:match.start()]
-                })
-            
-            # Add the marker
-            emotion = match.group(1).lower()
-            if emotion in emotions:
-                parts.append({
-                    'type': 'emotion',
-                    'emotion': emotion
-                })
-            
-            last_end = match.end()
-        
-        # Add any remaining text after the last marker
-        if last_end < len(text):
-            parts.append({
-                'type': 'text',
-                'content': text[last_end:]
-            })
-        
-        # Process the parts to build the final SSML
-        result = []
-        current_effect = None
-        
-        for i, part in enumerate(parts):
-            if part['type'] == 'text':
-                result.append(part['content'])
-            elif part['type'] == 'emotion':
-                emotion = part['emotion']
-                
-                # Handle the emotion
-                if emotion in emotions:
-                    if isinstance(emotions[emotion], list):
-                        # If we have an active effect, close it
-                        if current_effect:
-                            result.append(emotions[current_effect][1])
-                        
-                        # Open the new effect
-                        result.append(emotions[emotion][0])
-                        current_effect = emotion
-                    else:
-                        # Single tag like breath
-                        result.append(emotions[emotion])
-        
-        # Close the last effect if one is open
-        if current_effect:
-            result.append(emotions[current_effect][1])
-        
-        # Join the result and wrap in SSML tags
-        return f'<speak>{"".join(result)}</speak>'
-
-    def text_to_speech(self, text, output_path=None, format_text=True, voice_id='Joanna', output_format='mp3'):
+        """Convert (emotion) markers in chat text into SSML"""
+        with metrics.format_seconds.time():
+            return format_ssml(text)
+
+    def text_to_speech(self, text, output_path=None, format_text=True, voice_id='Joanna', output_format=None):
+        """Synthesize text and return the audio bytes, or write them to output_path if given.
+
+        The router decides which backend to try first; if it fails the next
+        one is tried. Cached audio is keyed by backend too, so a clip spoken
+        by the local engine never stands in for the Polly version.
+        """
         if format_text:
             text = self.format_text(text)
-        response = self.polly.synthesize_speech(
-            Text=text,
-            VoiceId=voice_id,
-            OutputFormat=output_format,
-            TextType='ssml' if text.strip().startswith('<speak>') else 'text'
-        )
-        audio_stream = response.get('AudioStream')
-        if audio_stream:
-            if output_path:
-                with open(output_path, 'wb') as f:
-                    f.write(audio_stream.read())
-                return output_path
-            else:
-                fd, output_path = tempfile.mkstemp(suffix=f'.{output_format}')
-                os.close(fd)
-                with open(output_path, 'wb') as f:
-                    f.write(audio_stream.read())
+        output_format = output_format or self.output_format
+        sample_rate = self.sample_rate if output_format == self.output_format else None
+        # Clips at different sample rates are different audio
+        format_key = f"{output_format}@{sample_rate}" if sample_rate else output_format
+
+        audio = self._cached(text, voice_id, format_key)
+        error = None
+        for backend in self.router.candidates(text, voice_id) if audio is None else ():
+            start = time.perf_counter()
+            try:
+                audio = backend.synthesize(text, voice_id, output_format, sample_rate)
+            except Exception as e:
+                self.router.observe(backend, voice_id, ok=False)
+                metrics.tts_backend_requests.inc(backend=backend.name, result='error')
+                print(f"[yellow]TTS backend {backend.name} failed for voice {voice_id}: {e}[/yellow]")
+                error = e
+                continue
+            elapsed = time.perf_counter() - start
+            self.router.observe(backend, voice_id, elapsed, ok=audio is not None)
+            metrics.tts_backend_requests.inc(backend=backend.name, result='ok' if audio else 'empty')
+            if audio is None:
+                continue
+            metrics.tts_backend_seconds.observe(elapsed, backend=backend.name)
+            if self.cache:
+                self.cache.put(self.cache.make_key(text, voice_id, format_key, backend.name), audio)
+            break
+
+        if audio is None:
+            if error is not None:
+                raise error
+            return None
+
+        if output_path:
+            with open(output_path, 'wb') as f:
+                f.write(audio)
             return output_path
-        return None
\ No newline at end of file
+        return audio
+
+    def _cached(self, text, voice_id, output_format):
+        """Cached audio from any backend, best backend first, even if the router would pick another now"""
+        if not self.cache:
+            return None
+        for backend in self.router.backends:
+            audio = self.cache.get(self.cache.make_key(text, voice_id, output_format, backend.name))
+            if audio is not None:
+                metrics.tts_cache_lookups.inc(result='hit')
+                return audio
+        metrics.tts_cache_lookups.inc(result='miss')
+        return None
+
+    def iter_speech_chunks(self, text, voice_id='Joanna', output_format=None):
+        """Synthesize chat text and yield the audio of each chunk in playback order.
+
+        Long messages are split at sentence or effect boundaries and the
+        chunks are synthesized concurrently, so the first chunk can start
+        playing while the rest are still being synthesized. Short
+        messages, or every message when chunking is disabled, come back as
+        a single chunk.
+        """
+        if not self.chunk_chars:
+            yield self.text_to_speech(text, voice_id=voice_id, output_format=output_format)
+            return
+
+        with metrics.format_seconds.time():
+            chunks = format_ssml_chunks(text, self.chunk_chars)
+        if len(chunks) == 1:
+            yield self.text_to_speech(chunks[0], format_text=False, voice_id=voice_id, output_format=output_format)
+            return
+
+        executor = self._get_chunk_executor()
+        futures = [executor.submit(self.text_to_speech, chunk, format_text=False,
+                                   voice_id=voice_id, output_format=output_format)
+                   for chunk in chunks]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            # Stop synthesizing the rest if playback was abandoned
+            for future in futures:
+                future.cancel()
+
+    def _get_chunk_executor(self):
+        with self._chunk_lock:
+            if self._chunk_executor is None:
+                self._chunk_executor = ThreadPoolExecutor(max_workers=self.chunk_workers,
+                                                          thread_name_prefix='tts-chunk')
+            return self._chunk_executor
@@ -0,0 +1,362 @@
+import asyncio
+import threading
+import time
+from collections import deque
+
+from rich import print
+
+import metrics
+
+
+class SlotQueue:
+    """Ordered queue of pending TTS jobs for a single user slot.
+
+    With coalescing enabled, a message arriving while others are still
+    queued is merged into the last queued job so a burst of chat lines
+    becomes one synthesis request. Jobs that waited longer than max_age
+    seconds are skipped instead of being spoken late.
+    """
+
+    def __init__(self, user_number, max_depth, drop_policy, coalesce_chars=0, max_age=0):
+        self.user_number = user_number
+        self.jobs = deque()
+        self.max_depth = max_depth
+        self.drop_policy = drop_policy
+        self.coalesce_chars = coalesce_chars  # longest merged message, 0 disables coalescing
+        self.max_age = max_age  # seconds a job may wait, 0 disables expiry
+        self.epoch = 0  # bumped whenever the slot is cleared, so in-flight jobs can tell they are stale
+        self.active = False  # True while a job of this slot is open
+        self.running = False  # True while a worker runs the open job's handler
+        self.holds = 0  # holds keeping the open job open after its handler returned
+        self.scheduled = False  # True while the slot waits in the ready queue
+        self.deadline = None  # monotonic time the last popped job goes stale, None without max_age
+        self.submitted = 0
+        self.processed = 0
+        self.coalesced = 0
+        self.expired = 0
+        self.dropped = 0
+        self.failed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def push(self, message):
+        """Add a job, applying the drop policy when full. Returns False if the job was dropped"""
+        self.submitted += 1
+        if self.jobs and self.coalesce_chars:
+            last_message, _ = self.jobs[-1]
+            merged = f"{last_message} {message}"
+            if len(merged) <= self.coalesce_chars:
+                # The merged job counts its age from the newest line in it
+                self.jobs[-1] = (merged, time.monotonic())
+                self.coalesced += 1
+                return True
+        if len(self.jobs) >= self.max_depth:
+            self.dropped += 1
+            if self.drop_policy == 'newest':
+                print(f"[yellow]TTS queue for user {self.user_number} is full, dropping new message[/yellow]")
+                return False
+            self.jobs.popleft()
+            print(f"[yellow]TTS queue for user {self.user_number} is full, dropping oldest message[/yellow]")
+        self.jobs.append((message, time.monotonic()))
+        return True
+
+    def pop(self):
+        """Take the next job that is not too old and record how long it waited, returns None if none is left"""
+        now = time.monotonic()
+        while self.jobs:
+            message, enqueued_at = self.jobs.popleft()
+            waited = now - enqueued_at
+            if not self.max_age or waited <= self.max_age:
+                break
+            self.expired += 1
+            print(f"[yellow]Skipping TTS message for user {self.user_number} that waited {waited:.1f}s[/yellow]")
+        else:
+            return None
+        self.deadline = enqueued_at + self.max_age if self.max_age else None
+        self.processed += 1
+        metrics.tts_queue_wait_seconds.observe(waited)
+        self.total_wait += waited
+        if waited > self.max_wait:
+            self.max_wait = waited
+        return message
+
+    def clear(self):
+        cleared = len(self.jobs)
+        self.dropped += cleared
+        self.jobs.clear()
+        self.epoch += 1
+        return cleared
+
+    def get_stats(self):
+        return {
+            'queue_length': len(self.jobs),
+            'active': self.active,
+            'submitted': self.submitted,
+            'processed': self.processed,
+            'coalesced': self.coalesced,
+            'expired': self.expired,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'avg_wait': self.total_wait / self.processed if self.processed else 0.0,
+            'max_wait': self.max_wait,
+        }
+
+
+class TTSQueueManager:
+    """Fixed-size worker pool that runs TTS jobs from one ordered queue per slot.
+
+    Jobs for the same slot always run one at a time and in arrival order, so
+    a single chatter can never have overlapping utterances. Different slots
+    are served round-robin by the shared workers, which are started on the
+    first submit.
+    """
+
+    DROP_POLICIES = ('oldest', 'newest')
+
+    def __init__(self, handler, workers=2, max_depth=5, drop_policy='oldest', coalesce_chars=0, max_age=0):
+        if drop_policy not in self.DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy '{drop_policy}', expected one of {self.DROP_POLICIES}")
+        self.handler = handler  # called as handler(message, user_number)
+        self.workers = workers
+        self.max_depth = max_depth
+        self.drop_policy = drop_policy
+        self.coalesce_chars = coalesce_chars
+        self.max_age = max_age
+        self.slots = {}
+        self._ready = deque()  # slots that have jobs and no worker yet
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._shutdown = False
+        self._threads = []
+
+    def _get_slot(self, user_number):
+        slot = self.slots.get(user_number)
+        if slot is None:
+            slot = self.slots[user_number] = SlotQueue(user_number, self.max_depth, self.drop_policy,
+                                                       self.coalesce_chars, self.max_age)
+        return slot
+
+    def _start_workers(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"tts-worker-{i + 1}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, user_number, message):
+        """Queue a message for a slot, returns False if it was dropped"""
+        with self._lock:
+            if not self._threads:
+                self._start_workers()
+            slot = self._get_slot(user_number)
+            if not slot.push(message):
+                return False
+            if not slot.active and not slot.scheduled:
+                slot.scheduled = True
+                self._ready.append(slot)
+                self._wakeup.notify()
+        return True
+
+    def clear(self, user_number):
+        """Drop every pending job for a slot and mark the running one as stale"""
+        with self._lock:
+            slot = self.slots.get(user_number)
+            return slot.clear() if slot else 0
+
+    def epoch(self, user_number):
+        """Counter that changes whenever the slot is cleared"""
+        with self._lock:
+            slot = self.slots.get(user_number)
+            return slot.epoch if slot else 0
+
+    def deadline(self, user_number):
+        """time.monotonic() after which the running job's audio is too old to start, None if it never is"""
+        with self._lock:
+            slot = self.slots.get(user_number)
+            return slot.deadline if slot else None
+
+    def get_stats(self):
+        """Return queue statistics for every slot"""
+        with self._lock:
+            return {user_number: slot.get_stats() for user_number, slot in self.slots.items()}
+
+    def hold(self, user_number):
+        """Keep the slot's running job open after its handler returns, until the returned release() is called.
+
+        Called from a handler so its job ends when its audio starts playing
+        rather than when it was handed to the mixer. Later messages then wait
+        in the slot queue, where they are coalesced, expired or dropped.
+        """
+        with self._lock:
+            slot = self.slots[user_number]
+            slot.holds += 1
+        released = threading.Event()
+
+        def release():
+            with self._lock:
+                if released.is_set():
+                    return
+                released.set()
+                slot.holds -= 1
+                if not slot.holds and not slot.running:
+                    self._release(slot)
+
+        return release
+
+    def shutdown(self, wait=False):
+        with self._lock:
+            self._shutdown = True
+            self._wakeup.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def _next_job(self):
+        """Block until a slot has work, then claim one job from it"""
+        with self._lock:
+            while True:
+                if self._shutdown:
+                    return None
+                while self._ready:
+                    slot = self._ready.popleft()
+                    slot.scheduled = False
+                    message = slot.pop()
+                    if message is not None:
+                        slot.active = True
+                        slot.running = True
+                        return slot, message
+                self._wakeup.wait()
+
+    def _release(self, slot):
+        """Close the slot's job, rescheduling the slot if more jobs arrived. Called with the lock held"""
+        slot.active = False
+        if slot.jobs and not slot.scheduled:
+            slot.scheduled = True
+            self._ready.append(slot)
+            self._wakeup.notify()
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            slot, message = job
+            try:
+                self.handler(message, slot.user_number)
+            except Exception as e:
+                with self._lock:
+                    slot.failed += 1
+                print(f"[red]Error processing TTS for user {slot.user_number}: {e}[/red]")
+            finally:
+                with self._lock:
+                    slot.running = False
+                    if not slot.holds:
+                        self._release(slot)
+
+
+class AsyncTTSQueueManager:
+    """asyncio counterpart of TTSQueueManager for the single event loop runtime.
+
+    The same per-slot ordering and drop policy apply, but jobs are
+    coroutines run by a fixed number of worker tasks instead of threads.
+    Must be created from inside the running event loop.
+    """
+
+    def __init__(self, handler, workers=2, max_depth=5, drop_policy='oldest', coalesce_chars=0, max_age=0):
+        if drop_policy not in TTSQueueManager.DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy '{drop_policy}', expected one of {TTSQueueManager.DROP_POLICIES}")
+        self.handler = handler  # awaited as handler(message, user_number)
+        self.max_depth = max_depth
+        self.drop_policy = drop_policy
+        self.coalesce_chars = coalesce_chars
+        self.max_age = max_age
+        self.slots = {}
+        self._loop = asyncio.get_running_loop()
+        self._ready = asyncio.Queue()
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(workers)]
+
+    def _get_slot(self, user_number):
+        slot = self.slots.get(user_number)
+        if slot is None:
+            slot = self.slots[user_number] = SlotQueue(user_number, self.max_depth, self.drop_policy,
+                                                       self.coalesce_chars, self.max_age)
+        return slot
+
+    def submit(self, user_number, message):
+        """Queue a message for a slot, returns False if it was dropped"""
+        slot = self._get_slot(user_number)
+        if not slot.push(message):
+            return False
+        if not slot.active and not slot.scheduled:
+            slot.scheduled = True
+            self._ready.put_nowait(slot)
+        return True
+
+    def clear(self, user_number):
+        """Drop every pending job for a slot and mark the running one as stale"""
+        slot = self.slots.get(user_number)
+        return slot.clear() if slot else 0
+
+    def epoch(self, user_number):
+        """Counter that changes whenever the slot is cleared"""
+        slot = self.slots.get(user_number)
+        return slot.epoch if slot else 0
+
+    def deadline(self, user_number):
+        """time.monotonic() after which the running job's audio is too old to start, None if it never is"""
+        slot = self.slots.get(user_number)
+        return slot.deadline if slot else None
+
+    def get_stats(self):
+        """Return queue statistics for every slot"""
+        return {user_number: slot.get_stats() for user_number, slot in self.slots.items()}
+
+    def hold(self, user_number):
+        """Keep the slot's running job open after its handler returns, until release() is called.
+
+        release() may be called from any thread, e.g. an AudioManager callback.
+        """
+        slot = self.slots[user_number]
+        slot.holds += 1
+        released = threading.Event()
+
+        def release_on_loop():
+            slot.holds -= 1
+            if not slot.holds and not slot.running:
+                self._release(slot)
+
+        def release():
+            if not released.is_set():
+                released.set()
+                self._loop.call_soon_threadsafe(release_on_loop)
+
+        return release
+
+    def shutdown(self, wait=False):
+        for task in self._tasks:
+            task.cancel()
+
+    async def _worker(self):
+        while True:
+            slot = await self._ready.get()
+            slot.scheduled = False
+            message = slot.pop()
+            if message is None:
+                continue
+            slot.active = True
+            slot.running = True
+            try:
+                await self.handler(message, slot.user_number)
+            except Exception as e:
+                slot.failed += 1
+                print(f"[red]Error processing TTS for user {slot.user_number}: {e}[/red]")
+            finally:
+                slot.running = False
+                if not slot.holds:
+                    self._release(slot)
+
+    def _release(self, slot):
+        """Close the slot's job, rescheduling the slot if more jobs arrived"""
+        slot.active = False
+        if slot.jobs and not slot.scheduled:
+            slot.scheduled = True
+            self._ready.put_nowait(slot)
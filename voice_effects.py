@@ -0,0 +1,166 @@
+"""
+Per-slot voice effects rendered in-process with NumPy.
+
+An alternative to toggling OBS audio filters for every utterance: a
+slot's effect chain runs on the synthesized samples before they are
+loaded into the mixer, so its sound costs no websocket round trips and
+the processed clip can be cached like any other audio. NumPy is optional,
+without it effects are unavailable and slots keep using OBS.
+
+A chain is configured as a comma separated list of presets and/or
+key=value settings, applied in this order:
+
+    pitch=1.3        resample by a factor, like a tape speed change (0.5-2)
+    eq=radio         FFT equalizer preset, see EQ_PRESETS
+    normalize=-18    scale to this RMS loudness in dBFS
+    gain=3           in dB
+    pan=-0.5         constant-power pan from -1 (left) to 1 (right), renders stereo
+
+e.g. VOICE_EFFECTS_2=chipmunk,pan=0.6
+"""
+
+import io
+import wave
+
+np = None  # imported on first use, NumPy is an optional dependency
+
+# (low cut Hz, high cut Hz, bass shelf dB, treble shelf dB), None for no cut
+EQ_PRESETS = {
+    'telephone': (300, 3400, 0, 0),
+    'radio': (150, 6000, 2, 3),
+    'warm': (None, 8000, 4, -2),
+    'bright': (120, None, -2, 5),
+    'muffled': (None, 1200, 3, 0),
+}
+
+PRESETS = {
+    'chipmunk': {'pitch': 1.35},
+    'giant': {'pitch': 0.8, 'eq': 'warm'},
+    'robot': {'eq': 'telephone', 'normalize': -16},
+    'announcer': {'eq': 'radio', 'normalize': -16, 'gain': 2},
+    'whisper': {'eq': 'muffled', 'gain': -6},
+    'left': {'pan': -0.7},
+    'right': {'pan': 0.7},
+}
+
+LIMITS = {'pitch': (0.5, 2.0), 'normalize': (-40.0, 0.0), 'gain': (-24.0, 24.0), 'pan': (-1.0, 1.0)}
+
+BASS_CORNER = 250  # Hz where the bass shelf is halfway
+TREBLE_CORNER = 4000  # Hz where the treble shelf is halfway
+PEAK_CEILING = 0.98  # samples are scaled down to stay below this after normalize/gain
+
+
+def _import_numpy():
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+
+def available():
+    """Whether NumPy can be imported, effects need it"""
+    try:
+        _import_numpy()
+    except ImportError:
+        return False
+    return True
+
+
+def parse_effects(spec):
+    """EffectChain for a configuration string, None when it's empty or 'none'"""
+    spec = (spec or '').strip().lower()
+    if spec in ('', 'none', 'off'):
+        return None
+    settings = {}
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        if '=' not in item:
+            if item not in PRESETS:
+                raise ValueError(f"Unknown voice effect preset '{item}', expected one of {tuple(PRESETS)}")
+            settings.update(PRESETS[item])
+            continue
+        name, value = (part.strip() for part in item.split('=', 1))
+        if name == 'eq':
+            if value not in EQ_PRESETS:
+                raise ValueError(f"Unknown EQ preset '{value}', expected one of {tuple(EQ_PRESETS)}")
+            settings[name] = value
+        elif name in LIMITS:
+            low, high = LIMITS[name]
+            number = float(value)
+            if not low <= number <= high:
+                raise ValueError(f"Voice effect {name}={value} is outside {low:g} to {high:g}")
+            settings[name] = number
+        else:
+            raise ValueError(f"Unknown voice effect '{name}', expected one of {('eq',) + tuple(LIMITS)}")
+    return EffectChain(**settings)
+
+
+class EffectChain:
+    """Effects of one slot, rendered from 16-bit samples to a WAV clip"""
+
+    def __init__(self, pitch=1.0, eq=None, normalize=None, gain=0.0, pan=0.0):
+        self.pitch = pitch
+        self.eq = eq
+        self.normalize = normalize
+        self.gain = gain
+        self.pan = pan
+        # Identifies the rendered result, part of the key processed clips are cached under
+        self.signature = f"pitch={pitch:g},eq={eq},normalize={normalize},gain={gain:g},pan={pan:g}"
+
+    def __repr__(self):
+        return f"EffectChain({self.signature})"
+
+    def render(self, samples, rate, channels=1):
+        """WAV bytes of interleaved signed 16-bit little-endian samples with the effects applied"""
+        _import_numpy()
+        audio = np.frombuffer(samples, dtype='<i2', count=len(samples) // 2).astype(np.float32) / 32768
+        if channels > 1:
+            # Speech is mono, extra channels are copies of it
+            audio = audio[:len(audio) - len(audio) % channels].reshape(-1, channels).mean(axis=1)
+        if self.pitch != 1.0 and len(audio):
+            audio = np.interp(np.arange(0, len(audio) - 1, self.pitch), np.arange(len(audio)), audio)
+        if self.eq is not None and len(audio):
+            audio = self._equalize(audio, rate, *EQ_PRESETS[self.eq])
+        if self.normalize is not None:
+            rms = float(np.sqrt(np.mean(audio * audio))) if len(audio) else 0.0
+            if rms > 0:
+                audio = audio * (10 ** (self.normalize / 20) / rms)
+        if self.gain:
+            audio = audio * (10 ** (self.gain / 20))
+        peak = float(np.max(np.abs(audio))) if len(audio) else 0.0
+        if peak > PEAK_CEILING:
+            audio = audio * (PEAK_CEILING / peak)
+
+        if self.pan:
+            # Constant power, so a panned voice is as loud as a centered one
+            angle = (self.pan + 1) * np.pi / 4
+            audio = np.column_stack((audio * np.cos(angle), audio * np.sin(angle)))
+        pcm = (audio * 32767).astype('<i2')
+
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as clip:
+            clip.setnchannels(2 if self.pan else 1)
+            clip.setsampwidth(2)
+            clip.setframerate(rate)
+            clip.writeframes(pcm.tobytes())
+        return buffer.getvalue()
+
+    @staticmethod
+    def _equalize(audio, rate, low_cut, high_cut, bass_db, treble_db):
+        """Shape the spectrum with second order cut-offs and first order shelves"""
+        spectrum = np.fft.rfft(audio)
+        freqs = np.fft.rfftfreq(len(audio), 1 / rate)
+        freqs[0] = 1e-3  # keep the DC bin out of the divisions below
+        curve = np.ones_like(freqs)
+        if low_cut:
+            curve /= np.sqrt(1 + (low_cut / freqs) ** 4)
+        if high_cut:
+            curve /= np.sqrt(1 + (freqs / high_cut) ** 4)
+        if bass_db:
+            curve *= 10 ** (bass_db / 20 / (1 + (freqs / BASS_CORNER) ** 2))
+        if treble_db:
+            curve *= 10 ** (treble_db / 20 / (1 + (TREBLE_CORNER / freqs) ** 2))
+        return np.fft.irfft(spectrum * curve, n=len(audio)).astype(np.float32)